@@ -2,68 +2,27 @@
 """
 Generate secure API keys for BiometricFlow-ZK services
 """
-import secrets
+import base64
+import json
 import os
+import string
+import sys
 from pathlib import Path
 
-def generate_secure_key(length=32):
-    """Generate a secure API key"""
-    return secrets.token_urlsafe(length)
-
-def main():
-    print("🔐 Generating secure API keys for BiometricFlow-ZK services...")
-    print("=" * 60)
-    
-    # Generate keys for each service
-    keys = {
-        'MAIN_API_KEY': generate_secure_key(32),
-        'UNIFIED_GATEWAY_API_KEY': generate_secure_key(32),
-        'PLACE_BACKEND_API_KEY': generate_secure_key(32),
-        'FRONTEND_API_KEY': generate_secure_key(32),
-        'JWT_SECRET': generate_secure_key(32),
-        'UNIFIED_JWT_SECRET': generate_secure_key(32),
-        'PLACE_JWT_SECRET': generate_secure_key(32),
-        'FRONTEND_JWT_SECRET': generate_secure_key(32),
-    }
-    
-    print("Generated keys:")
-    for key_name, key_value in keys.items():
-        print(f"{key_name}={key_value}")
-    
-    print("\n" + "=" * 60)
-    print("🔧 Key Assignment for Each Service:")
-    print("=" * 60)
-    
-    print("\n📍 Place Backend (.env):")
-    print(f"MAIN_API_KEY={keys['PLACE_BACKEND_API_KEY']}")
-    print(f"JWT_SECRET={keys['PLACE_JWT_SECRET']}")
-    print(f"UNIFIED_GATEWAY_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}")
-    
-    print("\n🌐 Unified Gateway (.env):")
-    print(f"MAIN_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}")
-    print(f"JWT_SECRET={keys['UNIFIED_JWT_SECRET']}")
-    print(f"PLACE_BACKEND_API_KEY={keys['PLACE_BACKEND_API_KEY']}")
-    print(f"FRONTEND_API_KEY={keys['FRONTEND_API_KEY']}")
-    
-    print("\n💻 Frontend (.env):")
-    print(f"MAIN_API_KEY={keys['FRONTEND_API_KEY']}")
-    print(f"JWT_SECRET={keys['FRONTEND_JWT_SECRET']}")
-    print(f"UNIFIED_GATEWAY_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}")
-    
-    # Create updated environment files
-    create_env_files(keys)
-    
-    print("\n✅ Environment files created/updated!")
-    print("🚀 You can now start the services in order:")
-    print("   1. Place Backend: python src/biometric_flow/backend/place_backend.py")
-    print("   2. Unified Gateway: python src/biometric_flow/backend/unified_gateway.py")
-    print("   3. Frontend: streamlit run src/biometric_flow/frontend/app.py")
-
-def create_env_files(keys):
-    """Create environment files for each service"""
-    
-    # Place Backend Environment
-    place_env_content = f"""# Place Backend Environment Configuration
+# Keys generated for the services, in report order
+KEY_NAMES = (
+    'MAIN_API_KEY',
+    'UNIFIED_GATEWAY_API_KEY',
+    'PLACE_BACKEND_API_KEY',
+    'FRONTEND_API_KEY',
+    'JWT_SECRET',
+    'UNIFIED_JWT_SECRET',
+    'PLACE_JWT_SECRET',
+    'FRONTEND_JWT_SECRET',
+)
+
+# Place Backend Environment
+PLACE_ENV_TEMPLATE = string.Template("""# Place Backend Environment Configuration
 # Generated automatically with secure keys
 # =====================================
 
@@ -79,13 +38,12 @@ PLACE_LOCATION=Building A, Floor 1
 PLACE_ID=place_001
 
 # Security Configuration - UNIQUE FOR THIS PLACE
-JWT_SECRET={keys['PLACE_JWT_SECRET']}
+JWT_SECRET=${PLACE_JWT_SECRET}
 JWT_EXPIRE_HOURS=24
-MAIN_API_KEY={keys['PLACE_BACKEND_API_KEY']}
-BACKEND_API_KEY={keys['PLACE_BACKEND_API_KEY']}
+MAIN_API_KEY=${PLACE_BACKEND_API_KEY}
 
 # Unified Gateway Communication
-UNIFIED_GATEWAY_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}
+UNIFIED_GATEWAY_API_KEY=${UNIFIED_GATEWAY_API_KEY}
 UNIFIED_GATEWAY_URL=http://localhost:9000
 
 # Rate Limiting
@@ -109,15 +67,15 @@ EARLY_LEAVE_THRESHOLD_MINUTES=30
 
 # Auto-registration with Unified Gateway
 AUTO_REGISTER_WITH_UNIFIED=true
-REGISTRATION_RETRY_INTERVAL=30
+REGISTRATION_RETRY_INTERVAL=300
 
 # Logging
 LOG_LEVEL=INFO
 LOG_FILE=place_backend.log
-"""
+""")
 
-    # Unified Gateway Environment
-    gateway_env_content = f"""# Unified Gateway Environment Configuration
+# Unified Gateway Environment
+GATEWAY_ENV_TEMPLATE = string.Template("""# Unified Gateway Environment Configuration
 # Generated automatically with secure keys
 # =========================================
 
@@ -128,16 +86,15 @@ SERVICE_HOST=0.0.0.0
 ENVIRONMENT=production
 
 # Security Configuration - UNIQUE FOR GATEWAY
-JWT_SECRET={keys['UNIFIED_JWT_SECRET']}
+JWT_SECRET=${UNIFIED_JWT_SECRET}
 JWT_EXPIRE_HOURS=24
-MAIN_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}
-BACKEND_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}
+MAIN_API_KEY=${UNIFIED_GATEWAY_API_KEY}
 
 # Place Backend Communication
-PLACE_BACKEND_API_KEY={keys['PLACE_BACKEND_API_KEY']}
+PLACE_BACKEND_API_KEY=${PLACE_BACKEND_API_KEY}
 
 # Frontend Communication
-FRONTEND_API_KEY={keys['FRONTEND_API_KEY']}
+FRONTEND_API_KEY=${FRONTEND_API_KEY}
 FRONTEND_JWT_EXPIRE_HOURS=8
 
 # Rate Limiting
@@ -161,10 +118,10 @@ LOG_FILE=unified_gateway.log
 CACHE_TTL=300
 MAX_CONCURRENT_REQUESTS=10
 REQUEST_TIMEOUT=30
-"""
+""")
 
-    # Frontend Environment
-    frontend_env_content = f"""# Frontend Environment Configuration
+# Frontend Environment
+FRONTEND_ENV_TEMPLATE = string.Template("""# Frontend Environment Configuration
 # Generated automatically with secure keys
 # =================================
 
@@ -175,13 +132,13 @@ SERVICE_HOST=0.0.0.0
 ENVIRONMENT=production
 
 # Security Configuration - UNIQUE FOR FRONTEND
-JWT_SECRET={keys['FRONTEND_JWT_SECRET']}
-FRONTEND_API_KEY={keys['FRONTEND_API_KEY']}
+JWT_SECRET=${FRONTEND_JWT_SECRET}
+FRONTEND_API_KEY=${FRONTEND_API_KEY}
 SESSION_TIMEOUT=3600
 MAX_REQUEST_SIZE=5242880
 
 # Unified Gateway Communication
-UNIFIED_GATEWAY_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}
+UNIFIED_GATEWAY_API_KEY=${UNIFIED_GATEWAY_API_KEY}
 BACKEND_URL=http://localhost:9000
 REQUEST_TIMEOUT=30
 
@@ -207,50 +164,121 @@ DEFAULT_DATE_RANGE_DAYS=30
 # Logging
 LOG_LEVEL=INFO
 LOG_FILE=frontend_app.log
-"""
+""")
 
-    # Backend places config
-    backend_places_config = f"""{{
-  "places": {{
-    "place_001": {{
-      "name": "Main Office",
-      "location": "Building A, Floor 1",
-      "url": "http://localhost:8000",
-      "api_key": "{keys['PLACE_BACKEND_API_KEY']}",
-      "enabled": true,
-      "health_check_endpoint": "/health",
-      "timeout": 30
-    }},
-    "place_002": {{
-      "name": "Branch Office",
-      "location": "Building B, Floor 2", 
-      "url": "http://localhost:8001",
-      "api_key": "{keys['PLACE_BACKEND_API_KEY']}",
-      "enabled": false,
-      "health_check_endpoint": "/health",
-      "timeout": 30
-    }}
-  }},
-  "discovery_settings": {{
-    "auto_register": true,
-    "health_check_interval": 60,
-    "max_retries": 3,
-    "retry_delay": 10
-  }}
-}}"""
-
-    # Write files
-    with open('place_backend.env', 'w') as f:
-        f.write(place_env_content)
+def generate_secure_keys(count, nbytes=32):
+    """Generate several secure API keys from a single urandom read"""
+    # Round up to whole 3-byte groups so each key maps to its own base64 chars
+    nbytes = -(-nbytes // 3) * 3
+    width = nbytes // 3 * 4
+    encoded = base64.urlsafe_b64encode(os.urandom(count * nbytes)).decode('ascii')
+    return [encoded[i * width:(i + 1) * width] for i in range(count)]
+
+def main():
+    out = [
+        "🔐 Generating secure API keys for BiometricFlow-ZK services...",
+        "=" * 60,
+    ]
+    
+    # Generate keys for each service
+    keys = dict(zip(KEY_NAMES, generate_secure_keys(len(KEY_NAMES), nbytes=32)))
+    
+    out.append("Generated keys:")
+    out.extend(f"{key_name}={key_value}" for key_name, key_value in keys.items())
     
-    with open('unified_gateway.env', 'w') as f:
-        f.write(gateway_env_content)
+    out.extend([
+        "\n" + "=" * 60,
+        "🔧 Key Assignment for Each Service:",
+        "=" * 60,
+        
+        "\n📍 Place Backend (.env):",
+        f"MAIN_API_KEY={keys['PLACE_BACKEND_API_KEY']}",
+        f"JWT_SECRET={keys['PLACE_JWT_SECRET']}",
+        f"UNIFIED_GATEWAY_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}",
         
-    with open('frontend.env', 'w') as f:
-        f.write(frontend_env_content)
+        "\n🌐 Unified Gateway (.env):",
+        f"MAIN_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}",
+        f"JWT_SECRET={keys['UNIFIED_JWT_SECRET']}",
+        f"PLACE_BACKEND_API_KEY={keys['PLACE_BACKEND_API_KEY']}",
+        f"FRONTEND_API_KEY={keys['FRONTEND_API_KEY']}",
         
-    with open('backend_places_config.json', 'w') as f:
-        f.write(backend_places_config)
+        "\n💻 Frontend (.env):",
+        f"MAIN_API_KEY={keys['FRONTEND_API_KEY']}",
+        f"JWT_SECRET={keys['FRONTEND_JWT_SECRET']}",
+        f"UNIFIED_GATEWAY_API_KEY={keys['UNIFIED_GATEWAY_API_KEY']}",
+    ])
+    
+    # Create updated environment files
+    create_env_files(keys)
+    
+    out.extend([
+        "\n✅ Environment files created/updated!",
+        "🚀 You can now start the services in order:",
+        "   1. Place Backend: python src/biometric_flow/backend/place_backend.py",
+        "   2. Unified Gateway: python src/biometric_flow/backend/unified_gateway.py",
+        "   3. Frontend: streamlit run src/biometric_flow/frontend/app.py",
+    ])
+    
+    # Emit the whole report with a single write
+    sys.stdout.write("\n".join(out) + "\n")
+
+def create_env_files(keys):
+    """Create environment files for each service"""
+    
+    place_env_content = PLACE_ENV_TEMPLATE.substitute(keys)
+    gateway_env_content = GATEWAY_ENV_TEMPLATE.substitute(keys)
+    frontend_env_content = FRONTEND_ENV_TEMPLATE.substitute(keys)
+
+    # Backend places config
+    backend_places_config = json.dumps({
+        "places": {
+            "place_001": {
+                "name": "Main Office",
+                "location": "Building A, Floor 1",
+                "url": "http://localhost:8000",
+                "api_key": keys['PLACE_BACKEND_API_KEY'],
+                "enabled": True,
+                "health_check_endpoint": "/health",
+                "timeout": 30
+            },
+            "place_002": {
+                "name": "Branch Office",
+                "location": "Building B, Floor 2",
+                "url": "http://localhost:8001",
+                "api_key": keys['PLACE_BACKEND_API_KEY'],
+                "enabled": False,
+                "health_check_endpoint": "/health",
+                "timeout": 30
+            }
+        },
+        "discovery_settings": {
+            "auto_register": True,
+            "health_check_interval": 60,
+            "max_retries": 3,
+            "retry_delay": 10
+        }
+    }, indent=2)
+
+    # Write every file next to its target first, then swap them all in
+    files = (
+        ('place_backend.env', place_env_content),
+        ('unified_gateway.env', gateway_env_content),
+        ('frontend.env', frontend_env_content),
+        ('backend_places_config.json', backend_places_config),
+    )
+    for path, content in files:
+        write_file(path + '.tmp', content)
+    for path, _ in files:
+        os.replace(path + '.tmp', path)
+
+def write_file(path, content):
+    """Write and fsync content in a single call on a raw fd, readable only by the owner"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, content.encode('ascii'))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 if __name__ == "__main__":
     main()
@@ -4,20 +4,28 @@ Fingerprint device backend with enhanced security for NGROK deployment
 """
 from fastapi import FastAPI, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing import List, Optional, Dict, Any, Tuple, FrozenSet
+from datetime import date, datetime, timedelta
 from collections import defaultdict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
 import os
 import json
+import hmac
+import re
 import asyncio
+import threading
+import time
 import uvicorn
 import logging
 from pathlib import Path
 import sys
 import aiohttp
-import threading
-import time
+import orjson
 from dotenv import load_dotenv
 
 # Load environment variables from place_backend.env file
@@ -30,6 +38,7 @@ from security import (
     log_security_event, create_secure_response, create_error_response,
     generate_secure_session, create_jwt_token
 )
+from cache import TTLCache, create_shared_cache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -50,20 +59,44 @@ except ImportError:
     ZK_AVAILABLE = False
     logger.warning("ZK library not available. Backend will not function properly.")
 
+# Day names indexed by datetime.weekday()
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def is_valid_date(date_str: str) -> bool:
+    """Check that a string is a real YYYY-MM-DD date without going through strptime"""
+    if not DATE_PATTERN.fullmatch(date_str):
+        return False
+    try:
+        date.fromisoformat(date_str)
+    except ValueError:
+        return False
+    return True
+
+def parse_additional_holidays(additional_holidays: Optional[str]) -> FrozenSet[str]:
+    """Split and validate a comma-separated list of YYYY-MM-DD holiday dates into a hashable set"""
+    if not additional_holidays:
+        return frozenset()
+    holidays = frozenset(holiday.strip() for holiday in additional_holidays.split(',') if holiday.strip())
+    if not all(is_valid_date(holiday) for holiday in holidays):
+        raise HTTPException(status_code=400, detail="Invalid additional holiday date format. Use YYYY-MM-DD")
+    return holidays
+
+def validate_date_range(start_date: str, end_date: str, max_days: int) -> None:
+    """Reject malformed, reversed or oversized date ranges with a 400 before any device I/O"""
+    if not (is_valid_date(start_date) and is_valid_date(end_date)):
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    span = date.fromisoformat(end_date).toordinal() - date.fromisoformat(start_date).toordinal()
+    if span < 0:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date")
+    if span >= max_days:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {max_days} days")
+
 # Helper functions using python-calendrical or fallback
 def get_day_name(weekday_index: int) -> str:
-    """Get day name using python-calendrical or fallback to standard names"""
-    if CALENDRICAL_AVAILABLE:
-        try:
-            # python-calendrical provides advanced calendar functionality
-            day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            return day_names[weekday_index]
-        except Exception as e:
-            logger.debug(f"Error using python-calendrical: {e}")
-    
-    # Fallback to standard day names
-    day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    return day_names[weekday_index]
+    """Get day name for a datetime.weekday() index"""
+    return DAY_NAMES[weekday_index]
 
 def is_working_day(date_obj: datetime, holidays: list) -> bool:
     """Check if a date is a working day using python-calendrical or standard logic"""
@@ -88,11 +121,48 @@ def is_working_day(date_obj: datetime, holidays: list) -> bool:
     # Fallback: working days are Sunday, Monday, Tuesday, Wednesday, Thursday
     return weekday in [6, 0, 1, 2, 3]
 
+@lru_cache(maxsize=64)
+def working_days_for_year(year: int, holidays: frozenset) -> frozenset:
+    """Date strings (YYYY-MM-DD) of every working day in a year, cached per holiday set"""
+    current_date = datetime(year, 1, 1)
+    working_days = set()
+    while current_date.year == year:
+        if is_working_day(current_date, holidays):
+            working_days.add(current_date.strftime('%Y-%m-%d'))
+        current_date += timedelta(days=1)
+    return frozenset(working_days)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one keep-alive HTTP session and run gateway registration over the app lifetime"""
+    # Blocking device I/O runs in the default executor; make sure every device can have
+    # a call in flight (plus headroom) even when the CPU-based default would be smaller
+    default_workers = min(32, (os.cpu_count() or 1) + 4)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=max(default_workers, len(config.devices) * 2), thread_name_prefix="zk-io")
+    )
+    
+    app.state.http = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=30),
+        connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60)
+    )
+    registration_task = start_background_registration(app.state.http)
+    try:
+        yield
+    finally:
+        if registration_task:
+            registration_task.cancel()
+            await asyncio.gather(registration_task, return_exceptions=True)
+        await app.state.http.close()
+        await asyncio.to_thread(close_device_connections)
+
 # Enhanced FastAPI app with security
 app = FastAPI(
     title="🔒 Secure Fingerprint Attendance Backend API",
     description="Enhanced secure backend service for fingerprint device data collection with NGROK support",
     version="3.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if os.getenv("ENVIRONMENT") != "production" else None,
     redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None,
     openapi_url="/openapi.json" if os.getenv("ENVIRONMENT") != "production" else None
@@ -110,6 +180,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@dataclass(slots=True, frozen=True)
+class DeviceConfig:
+    """Connection settings of a single configured device"""
+    name: str
+    ip: str
+    port: int
+    password: int
+
 # Configuration - Load from environment or config file
 class Config:
     def __init__(self):
@@ -123,14 +201,26 @@ class Config:
         self.place_location = os.getenv("PLACE_LOCATION", "Unknown Location")
         self.place_id = os.getenv("PLACE_ID", "place_001")
         
-        # Multiple devices configuration
-        self.devices = self._load_devices_config()
+        # Multiple devices configuration, plus a frozen snapshot for hot paths
+        self.devices, self.device_list = self._validate_devices(self._load_devices_config())
+        self.device_names: Tuple[str, ...] = tuple(device.name for device in self.device_list)
+        self.device_lookup: Dict[str, DeviceConfig] = {device.name: device for device in self.device_list}
+        self.device_concurrency = int(os.getenv("DEVICE_CONCURRENCY", "8"))
+        self.device_connection_ttl = int(os.getenv("DEVICE_CONNECTION_TTL", "60"))
+        self.device_probe_timeout = float(os.getenv("DEVICE_PROBE_TIMEOUT", "0.5"))
+        self.response_cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", "5"))
+        self.users_cache_ttl = float(os.getenv("USERS_CACHE_TTL", "300"))
+        self.attendance_cache_ttl = float(os.getenv("ATTENDANCE_CACHE_TTL", "60"))
+        self.redis_url = os.getenv("REDIS_URL", "")
+        self.max_date_range_days = int(os.getenv("MAX_DATE_RANGE_DAYS", "366"))
         
         # Unified Gateway connection settings
         self.unified_gateway_url = os.getenv("UNIFIED_GATEWAY_URL", "http://localhost:9000")
         self.unified_gateway_api_key = os.getenv("UNIFIED_GATEWAY_API_KEY", "")
+        self.backend_api_key = os.getenv("BACKEND_API_KEY") or os.getenv("MAIN_API_KEY", "")
         self.auto_register_with_unified = os.getenv("AUTO_REGISTER_WITH_UNIFIED", "true").lower() == "true"
-        self.registration_retry_interval = int(os.getenv("REGISTRATION_RETRY_INTERVAL", "30"))
+        # Upper bound (seconds) for the registration backoff, also the refresh interval once registered
+        self.registration_retry_interval = int(os.getenv("REGISTRATION_RETRY_INTERVAL", "300"))
         
         # Working hours configuration
         self.expected_working_hours = float(os.getenv("EXPECTED_WORKING_HOURS", "8"))
@@ -145,6 +235,26 @@ class Config:
             '2025-12-25',  # Christmas Day
             '2025-01-01',  # New Year's Day
         ]
+        self.holidays_set = frozenset(self.holidays)
+    
+    def _validate_devices(self, devices: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Tuple[DeviceConfig, ...]]:
+        """Keep the devices whose settings parse, logging and dropping the rest"""
+        valid_devices: Dict[str, Dict[str, Any]] = {}
+        device_list: List[DeviceConfig] = []
+        for name, device in devices.items():
+            try:
+                device_config = DeviceConfig(
+                    name=name,
+                    ip=device["ip"],
+                    port=int(device.get("port", 4370)),
+                    password=int(device.get("password", 0))
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Skipping device '{name}': invalid configuration ({type(e).__name__}: {e})")
+                continue
+            valid_devices[name] = device
+            device_list.append(device_config)
+        return valid_devices, tuple(device_list)
     
     def _load_devices_config(self) -> Dict[str, Dict[str, Any]]:
         """Load multiple devices configuration"""
@@ -161,22 +271,23 @@ class Config:
         ]
         
         for config_path in config_paths:
-            if os.path.exists(config_path):
-                try:
-                    with open(config_path, 'r') as f:
-                        config_data = json.load(f)
-                    
-                    # Handle both old format (direct devices) and new format (nested under "devices")
-                    if "devices" in config_data:
-                        devices = config_data["devices"]
-                    else:
-                        devices = config_data
-                    
-                    logger.info(f"Loaded {len(devices)} devices from config file: {config_path}")
-                    return devices
-                except Exception as e:
-                    logger.error(f"Error loading devices config file {config_path}: {e}")
-                    continue
+            try:
+                with open(config_path, 'r') as f:
+                    config_data = json.load(f)
+                
+                # Handle both old format (direct devices) and new format (nested under "devices")
+                if "devices" in config_data:
+                    devices = config_data["devices"]
+                else:
+                    devices = config_data
+                
+                logger.info(f"Loaded {len(devices)} devices from config file: {config_path}")
+                return devices
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.error(f"Error loading devices config file {config_path}: {e}")
+                continue
         
         # Fallback to environment variables for single device (backward compatibility)
         device_name = os.getenv("DEVICE_NAME", "Main Office")
@@ -216,12 +327,27 @@ class Config:
 
 config = Config()
 
+# Bounds how many devices are polled at once across all requests
+device_semaphore = asyncio.Semaphore(config.device_concurrency)
+
+# Short-lived cache for near-static responses polled by the gateway and dashboards
+response_cache = TTLCache(maxsize=32, ttl=config.response_cache_ttl)
+
+# Per-device user roster and user_id -> name map; rosters change far less often than attendance
+users_cache = TTLCache(maxsize=max(len(config.devices), 1), ttl=config.users_cache_ttl)
+
+# Processed attendance records keyed by (device, start, end, holidays) so dashboard refreshes skip the device
+attendance_cache = TTLCache(maxsize=128, ttl=config.attendance_cache_ttl)
+
+# Optional Redis cache shared by all workers/replicas of this place (enabled by REDIS_URL)
+shared_cache = create_shared_cache(config.redis_url, prefix=f"biometricflow:{config.place_id}")
+
 # Auto-registration with Unified Gateway
-async def register_with_unified_gateway():
-    """Register this place backend with the unified gateway"""
+async def register_with_unified_gateway(session: aiohttp.ClientSession) -> bool:
+    """Register this place backend with the unified gateway, returning whether it succeeded"""
     if not config.auto_register_with_unified or not config.unified_gateway_api_key:
         logger.info("Auto-registration disabled or API key not configured")
-        return
+        return False
     
     registration_data = {
         "place_id": config.place_id,
@@ -233,43 +359,60 @@ async def register_with_unified_gateway():
     }
     
     try:
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"Bearer {config.unified_gateway_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            async with session.post(
-                f"{config.unified_gateway_url}/place/register",
-                json=registration_data,
-                headers=headers,
-                timeout=30
-            ) as response:
-                if response.status == 200:
-                    logger.info(f"Successfully registered with unified gateway: {config.place_name}")
-                else:
-                    logger.error(f"Failed to register with unified gateway: {response.status}")
+        headers = {
+            "Authorization": f"Bearer {config.unified_gateway_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        async with session.post(
+            f"{config.unified_gateway_url}/place/register",
+            json=registration_data,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=30)
+        ) as response:
+            if response.status == 200:
+                logger.info(f"Successfully registered with unified gateway: {config.place_name}")
+                return True
+            logger.error(f"Failed to register with unified gateway: {response.status}")
     except Exception as e:
         logger.error(f"Error registering with unified gateway: {e}")
+    return False
 
-def start_background_registration():
-    """Start background thread for periodic registration attempts"""
-    def registration_loop():
-        while True:
-            try:
-                asyncio.run(register_with_unified_gateway())
-                time.sleep(config.registration_retry_interval)
-            except Exception as e:
-                logger.error(f"Background registration error: {e}")
-                time.sleep(30)  # Wait 30 seconds on error
+async def registration_loop(session: aiohttp.ClientSession):
+    """Register with the unified gateway until cancelled.
+
+    Failures are retried with exponential backoff (1s, 2s, 4s, ...) capped at
+    registration_retry_interval; once registered, only refresh at that cap.
+    """
+    max_backoff = config.registration_retry_interval
+    backoff = 1.0
+    while True:
+        try:
+            registered = await register_with_unified_gateway(session)
+        except Exception as e:
+            logger.error(f"Background registration error: {e}")
+            registered = False
+        
+        if registered:
+            backoff = 1.0
+            await asyncio.sleep(max_backoff)
+        else:
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+def start_background_registration(session: aiohttp.ClientSession) -> Optional[asyncio.Task]:
+    """Start periodic registration as a background task on the running event loop"""
+    if not config.auto_register_with_unified:
+        return None
     
-    if config.auto_register_with_unified:
-        thread = threading.Thread(target=registration_loop, daemon=True)
-        thread.start()
-        logger.info("Started background registration thread")
+    task = asyncio.create_task(registration_loop(session))
+    logger.info("Started background registration task")
+    return task
 
-# Pydantic models
+# Pydantic models - response models are frozen so cached instances can be shared safely
 class AttendanceRecord(BaseModel):
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+    
     user_name: str
     date: str
     day_name: str
@@ -283,6 +426,8 @@ class AttendanceRecord(BaseModel):
     expected_hours: Optional[float] = 8.0  # Standard working hours
 
 class DeviceInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     device_name: str
     device_ip: str
     device_port: int
@@ -291,6 +436,8 @@ class DeviceInfo(BaseModel):
     last_sync: Optional[str]
 
 class DeviceListResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     success: bool
     devices: List[DeviceInfo]
     backend_name: str
@@ -298,6 +445,8 @@ class DeviceListResponse(BaseModel):
     message: str
 
 class AttendanceResponse(BaseModel):
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+    
     success: bool
     data: List[AttendanceRecord]
     device_info: Optional[DeviceInfo]
@@ -310,6 +459,8 @@ class HolidayRequest(BaseModel):
     description: Optional[str] = None
 
 class HolidayResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     success: bool
     holidays: Optional[List[str]] = None
     valid_dates: Optional[List[str]] = None
@@ -320,24 +471,30 @@ class HolidayResponse(BaseModel):
     suggestions: Optional[List[Dict[str, str]]] = None
     message: str
 
-def calculate_working_time(check_in_time: str, check_out_time: str) -> tuple[str, float]:
-    """Calculate working time duration"""
+def build_device_info(device_name: str, is_connected: bool) -> DeviceInfo:
+    """Build the DeviceInfo for a configured device, stamping last_sync when it is connected"""
+    device = config.device_lookup[device_name]
+    return DeviceInfo(
+        device_name=device_name,
+        device_ip=device.ip,
+        device_port=device.port,
+        backend_name=config.backend_name,
+        is_connected=is_connected,
+        last_sync=datetime.now().isoformat() if is_connected else None
+    )
+
+def calculate_working_time(check_in_ts: datetime, check_out_ts: datetime) -> tuple[str, float]:
+    """Calculate working time duration between two punch timestamps"""
     try:
-        check_in = datetime.strptime(check_in_time, '%H:%M:%S')
-        check_out = datetime.strptime(check_out_time, '%H:%M:%S')
-        
-        # Handle case where check-out is next day
-        if check_out < check_in:
-            check_out += timedelta(days=1)
-        
-        duration = check_out - check_in
+        # Modulo a day handles a check-out that falls on the next day
+        total_seconds = int((check_out_ts - check_in_ts).total_seconds()) % 86400
         
         # Format duration as HH:MM:SS
-        hours, remainder = divmod(duration.seconds, 3600)
+        hours, remainder = divmod(total_seconds, 3600)
         minutes, seconds = divmod(remainder, 60)
         
         working_time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        working_hours = hours + minutes/60 + seconds/3600
+        working_hours = total_seconds / 3600
         
         return working_time_str, working_hours
     except:
@@ -366,6 +523,119 @@ def calculate_working_hours_progress(working_hours: float) -> float:
     progress = (working_hours / STANDARD_WORKING_HOURS) * 100
     return min(progress, 100.0)  # Cap at 100%
 
+def format_percentage(numerator: float, denominator: float) -> str:
+    """Format numerator/denominator as a one-decimal percentage string, "0%" when the denominator is zero"""
+    return f"{(numerator / denominator * 100):.1f}%" if denominator else "0%"
+
+# Summary stat keys for each working-day status, so aggregation loops don't build key strings per record
+STATUS_KEYS = {'Present': 'present', 'Absent': 'absent', 'Incomplete': 'incomplete'}
+
+# Stats for a device with no records in range, copied into responses so the summaries can return early
+EMPTY_OVERALL_STATS = {
+    "total_records": 0,
+    "working_days_count": 0,
+    "holiday_count": 0,
+    "present_count": 0,
+    "absent_count": 0,
+    "incomplete_count": 0,
+    "day_based_attendance_rate": "0%",
+    "standard_working_hours": 8.0,
+    "total_expected_hours": 0.0,
+    "total_actual_hours": 0.0,
+    "hours_based_progress": "0%"
+}
+EMPTY_DEVICE_STATS = {
+    "total_records": 0,
+    "working_days_count": 0,
+    "holiday_count": 0,
+    "present_count": 0,
+    "absent_count": 0,
+    "incomplete_count": 0,
+    "attendance_rate": "0%"
+}
+
+@dataclass(slots=True)
+class UserStats:
+    """Per-user counters accumulated by /attendance/summary"""
+    present_days: int = 0
+    absent_days: int = 0
+    incomplete_days: int = 0
+    holiday_days: int = 0
+    total_working_hours: float = 0.0
+    total_expected_hours: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Counters plus derived averages, in the summary response format"""
+        working_days = self.present_days + self.absent_days + self.incomplete_days
+        average_working_hours = 0.0
+        working_hours_progress = 0.0
+        if working_days > 0:
+            average_working_hours = self.total_working_hours / working_days
+            working_hours_progress = (self.total_working_hours / self.total_expected_hours * 100) if self.total_expected_hours > 0 else 0.0
+        return {
+            'present_days': self.present_days,
+            'absent_days': self.absent_days,
+            'incomplete_days': self.incomplete_days,
+            'holiday_days': self.holiday_days,
+            'total_working_hours': self.total_working_hours,
+            'total_expected_hours': self.total_expected_hours,
+            'average_working_hours': average_working_hours,
+            'working_hours_progress': working_hours_progress,
+            'attendance_rate': format_percentage(self.present_days, working_days)
+        }
+
+# Cached device connections: device_name -> (connection, last_used monotonic time)
+_device_connections: Dict[str, tuple] = {}
+_device_locks: Dict[str, threading.Lock] = {}
+
+def _disconnect_quietly(conn) -> None:
+    try:
+        conn.disconnect()
+    except Exception as e:
+        logger.debug(f"Error disconnecting from device: {e}")
+
+@contextmanager
+def device_connection(device_name: str):
+    """Hold a live connection to a ZK device, reusing a cached one while it is fresh.
+
+    The per-device lock is held for the whole block, since a pyzk connection
+    cannot be shared between threads.
+    """
+    with _device_locks.setdefault(device_name, threading.Lock()):
+        conn = None
+        entry = _device_connections.pop(device_name, None)
+        if entry:
+            cached_conn, last_used = entry
+            if time.monotonic() - last_used < config.device_connection_ttl:
+                try:
+                    cached_conn.get_time()  # Cheap ping to make sure the device is still there
+                    conn = cached_conn
+                except Exception:
+                    pass
+            if conn is None:
+                _disconnect_quietly(cached_conn)
+        
+        if conn is None:
+            device = config.device_lookup[device_name]
+            zk = ZK(device.ip, port=device.port, timeout=5, 
+                    password=device.password, force_udp=False, ommit_ping=False)
+            conn = zk.connect()
+        
+        try:
+            yield conn
+        except Exception:
+            _disconnect_quietly(conn)
+            raise
+        _device_connections[device_name] = (conn, time.monotonic())
+
+def close_device_connections() -> None:
+    """Disconnect every cached device connection"""
+    for device_name in list(_device_connections):
+        with _device_locks[device_name]:
+            entry = _device_connections.pop(device_name, None)
+            if entry:
+                _disconnect_quietly(entry[0])
+
 def test_device_connection(device_name: str = None) -> bool:
     """Test connection to ZK device"""
     if not ZK_AVAILABLE:
@@ -376,71 +646,136 @@ def test_device_connection(device_name: str = None) -> bool:
     
     # If no device specified, test the first device
     if not device_name:
-        device_name = list(config.devices.keys())[0] if config.devices else None
+        device_name = config.device_names[0] if config.device_names else None
         if not device_name:
             return False
     
-    device_config = config.devices[device_name]
-    
     try:
-        zk = ZK(device_config["ip"], port=device_config["port"], timeout=5, 
-                password=device_config["password"], force_udp=False, ommit_ping=False)
-        conn = zk.connect()
-        conn.disconnect()
-        return True
+        with device_connection(device_name):
+            return True
     except Exception as e:
         print(f"Device connection test failed for {device_name}: {str(e)}")
         return False
 
-def fetch_attendance_data(start_date: str, end_date: str, device_name: str, additional_holidays: List[str] = None) -> List[AttendanceRecord]:
-    """Fetch attendance data from specific ZK device"""
+async def tcp_probe(ip: str, port: int, timeout: float) -> bool:
+    """Check that a device's port accepts TCP connections, without the ZK handshake"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except Exception:
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return True
+
+async def test_device_connections(device_names: List[str]) -> List[bool]:
+    """Test connections to several ZK devices concurrently, off the event loop.
+
+    Devices without a cached connection get a quick TCP probe first, so unreachable
+    devices fail fast instead of waiting out the full ZK connect timeout.
+    """
+    async def test_one(device_name: str) -> bool:
+        device = config.device_lookup.get(device_name)
+        if device and device_name not in _device_connections:
+            if not await tcp_probe(device.ip, device.port, config.device_probe_timeout):
+                return False
+        return await asyncio.to_thread(test_device_connection, device_name)
+    
+    return await asyncio.gather(*(test_one(name) for name in device_names))
+
+def fetch_attendance_data(start_date: str, end_date: str, device_name: str, additional_holidays: Optional[FrozenSet[str]] = None, user_name: Optional[str] = None) -> List[AttendanceRecord]:
+    """Fetch attendance data from specific ZK device, optionally for a single user (case-insensitive).
+
+    Results are cached for ATTENDANCE_CACHE_TTL seconds and shared between callers,
+    so the returned list must not be mutated.
+    """
     if not ZK_AVAILABLE:
         raise HTTPException(status_code=500, detail="ZK library not available")
     
     if device_name not in config.devices:
         raise HTTPException(status_code=404, detail=f"Device '{device_name}' not found")
     
-    device_config = config.devices[device_name]
+    # Combine configured holidays with additional holidays
+    holidays_set = config.holidays_set | additional_holidays if additional_holidays else config.holidays_set
+    
+    user_filter = user_name.lower() if user_name else None
+    
+    # A cached full-device result can serve any single-user request as well
+    cache_key = (device_name, start_date, end_date, holidays_set)
+    cached_records = attendance_cache.get(cache_key)
+    if cached_records is not None:
+        if user_filter:
+            return [r for r in cached_records if r.user_name.lower() == user_filter]
+        return cached_records
+    
+    shared_key = f"attendance:{device_name}:{start_date}:{end_date}:{','.join(sorted(holidays_set))}"
+    if user_filter:
+        cache_key += (user_filter,)
+        shared_key += f":{user_filter}"
+        cached_records = attendance_cache.get(cache_key)
+        if cached_records is not None:
+            return cached_records
+    
+    if shared_cache:
+        rows = shared_cache.get(shared_key)
+        if rows is not None:
+            records = [AttendanceRecord.model_construct(**row) for row in rows]
+            attendance_cache.set(cache_key, records)
+            return records
     
     try:
         start_date_obj = datetime.strptime(start_date, '%Y-%m-%d')
         end_date_obj = datetime.strptime(end_date, '%Y-%m-%d')
         
-        # Combine configured holidays with additional holidays
-        all_holidays = config.holidays.copy()
-        if additional_holidays:
-            all_holidays.extend(additional_holidays)
-        
-        # Initialize ZK connection
-        zk = ZK(device_config["ip"], port=device_config["port"], timeout=5, 
-                password=device_config["password"], force_udp=False, ommit_ping=False)
-        conn = zk.connect()
-        conn.disable_device()
+        # Get users and attendance over a (possibly cached) device connection
+        cached_users = users_cache.get(device_name)
+        with device_connection(device_name) as conn:
+            if cached_users is None:
+                users = conn.get_users()
+                cached_users = (users, {user.user_id: user.name for user in users})
+                users_cache.set(device_name, cached_users)
+            attendances = conn.get_attendance()
+        users, name_map = cached_users
         
-        # Get users and attendance
-        users = conn.get_users()
-        attendances = conn.get_attendance()
+        # Only build records for the requested user, and skip everyone else's punches
+        if user_filter:
+            users = [user for user in users if user.name.lower() == user_filter]
+            user_ids = {user.user_id for user in users}
         
-        # Group attendances by user and date
-        daily_attendance = defaultdict(lambda: defaultdict(list))
+        # Keep only the first punch, last punch and punch count per user and date,
+        # skipping punches outside the requested range before doing any per-punch work
+        range_end = end_date_obj + timedelta(days=1)
+        daily_attendance = defaultdict(dict)
         for attendance in attendances:
-            user_name = next((user.name for user in users if user.user_id == attendance.user_id), 'Unknown')
-            date = attendance.timestamp.strftime('%Y-%m-%d')
-            daily_attendance[user_name][date].append(attendance.timestamp)
+            timestamp = attendance.timestamp
+            if timestamp < start_date_obj or timestamp >= range_end:
+                continue
+            if user_filter and attendance.user_id not in user_ids:
+                continue
+            user_name = name_map.get(attendance.user_id, 'Unknown')
+            date_key = timestamp.strftime('%Y-%m-%d')
+            day = daily_attendance[user_name]
+            punches = day.get(date_key)
+            if punches is None:
+                day[date_key] = (timestamp, timestamp, 1)
+            else:
+                first, last, count = punches
+                day[date_key] = (min(first, timestamp), max(last, timestamp), count + 1)
+        
+        # Date string, day name and weekday depend only on the date, so compute them once for all users
+        date_range = [date.fromordinal(ordinal) for ordinal in range(start_date_obj.toordinal(), end_date_obj.toordinal() + 1)]
+        date_tuples = [(d, d.isoformat(), DAY_NAMES[d.weekday()], d.weekday()) for d in date_range]
         
-        # Process data
+        # Process data - records are built from already well-typed values, so skip validation
         records = []
         for user in users:
             user_name = user.name
-            current_date = start_date_obj
-            while current_date <= end_date_obj:
-                day_name = get_day_name(current_date.weekday())
-                date_str = current_date.strftime('%Y-%m-%d')
-                day_of_week = current_date.weekday()
-                
+            for date_obj, date_str, day_name, day_of_week in date_tuples:
                 # Check if it's Friday (4) or Saturday (5) - Weekend holidays
                 if day_of_week in [4, 5]:  # Friday, Saturday
-                    records.append(AttendanceRecord(
+                    records.append(AttendanceRecord.model_construct(
                         user_name=user_name,
                         date=date_str,
                         day_name=day_name,
@@ -454,8 +789,8 @@ def fetch_attendance_data(start_date: str, end_date: str, device_name: str, addi
                         expected_hours=0.0
                     ))
                 # Check if it's a configured or additional holiday
-                elif date_str in all_holidays:
-                    records.append(AttendanceRecord(
+                elif date_str in holidays_set:
+                    records.append(AttendanceRecord.model_construct(
                         user_name=user_name,
                         date=date_str,
                         day_name=day_name,
@@ -469,31 +804,25 @@ def fetch_attendance_data(start_date: str, end_date: str, device_name: str, addi
                         expected_hours=0.0
                     ))
                 # Check if it's a working day (Sunday, Monday, Tuesday, Wednesday, Thursday)
-                elif is_working_day(current_date, all_holidays):
+                elif date_str in working_days_for_year(date_obj.year, holidays_set):
                     check_in = ''
                     check_out = ''
                     working_time_str = ''
                     working_hours = 0.0
                     
-                    if user_name in daily_attendance and date_str in daily_attendance[user_name]:
-                        timestamps = daily_attendance[user_name][date_str]
-                        timestamps.sort()
-                        
-                        if len(timestamps) >= 2:
-                            check_in = timestamps[0].strftime('%H:%M:%S')
-                            check_out = timestamps[-1].strftime('%H:%M:%S')
-                            working_time_str, working_hours = calculate_working_time(check_in, check_out)
-                        elif len(timestamps) == 1:
-                            check_in = timestamps[0].strftime('%H:%M:%S')
-                            check_out = ''
-                            working_time_str = ''
-                            working_hours = 0.0
+                    punches = daily_attendance[user_name].get(date_str) if user_name in daily_attendance else None
+                    if punches:
+                        first, last, count = punches
+                        check_in = first.strftime('%H:%M:%S')
+                        if count >= 2:
+                            check_out = last.strftime('%H:%M:%S')
+                            working_time_str, working_hours = calculate_working_time(first, last)
                     
                     # Determine status based on improved logic
                     status = determine_attendance_status(check_in, check_out, working_hours)
                     working_hours_progress = calculate_working_hours_progress(working_hours)
                     
-                    records.append(AttendanceRecord(
+                    records.append(AttendanceRecord.model_construct(
                         user_name=user_name,
                         date=date_str,
                         day_name=day_name,
@@ -506,17 +835,62 @@ def fetch_attendance_data(start_date: str, end_date: str, device_name: str, addi
                         device_name=device_name,
                         expected_hours=8.0
                     ))
-                
-                current_date += timedelta(days=1)
-        
-        conn.enable_device()
-        conn.disconnect()
         
+        attendance_cache.set(cache_key, records)
+        if shared_cache:
+            shared_cache.set(shared_key, [record.model_dump() for record in records], ttl=config.attendance_cache_ttl)
         return records
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching data from {device_name}: {str(e)}")
 
+async def fetch_attendance_data_async(start_date: str, end_date: str, device_name: str, additional_holidays: Optional[FrozenSet[str]] = None, user_name: Optional[str] = None) -> List[AttendanceRecord]:
+    """Fetch attendance data from one device in a worker thread, bounded by the device semaphore"""
+    async with device_semaphore:
+        return await asyncio.to_thread(fetch_attendance_data, start_date, end_date, device_name, additional_holidays, user_name)
+
+async def fetch_attendance_data_multi(start_date: str, end_date: str, device_names: List[str], additional_holidays: Optional[FrozenSet[str]] = None, user_name: Optional[str] = None) -> List[Any]:
+    """Fetch attendance data from several devices concurrently.
+
+    Returns one entry per device, in order: either its records or the exception it raised.
+    """
+    return await asyncio.gather(
+        *(fetch_attendance_data_async(start_date, end_date, name, additional_holidays, user_name) for name in device_names),
+        return_exceptions=True
+    )
+
+# Rows serialised per chunk when streaming attendance responses
+ATTENDANCE_STREAM_BATCH = 500
+
+# Serialise records straight to JSON bytes in pydantic-core, skipping the intermediate dicts
+attendance_record_adapter = TypeAdapter(AttendanceRecord)
+attendance_records_adapter = TypeAdapter(List[AttendanceRecord])
+
+def stream_attendance_response(records: List[AttendanceRecord], device_info: Optional[DeviceInfo], message: str) -> StreamingResponse:
+    """Stream an AttendanceResponse body in row batches instead of serialising it in one go.
+
+    The JSON is identical in shape to AttendanceResponse; "data" is written last so the
+    envelope can be sent before the rows.
+    """
+    def body():
+        envelope = {
+            "success": True,
+            "device_info": device_info.model_dump() if device_info else None,
+            "total_records": len(records),
+            "message": message
+        }
+        yield orjson.dumps(envelope)[:-1] + b',"data":['
+        for start in range(0, len(records), ATTENDANCE_STREAM_BATCH):
+            batch = attendance_records_adapter.dump_json(records[start:start + ATTENDANCE_STREAM_BATCH])[1:-1]
+            yield batch if start == 0 else b"," + batch
+        yield b"]}"
+    
+    return StreamingResponse(body(), media_type="application/json")
+
+def encode_ndjson(records: List[AttendanceRecord]) -> bytes:
+    """Encode records as newline-delimited JSON"""
+    return b"".join(attendance_record_adapter.dump_json(record) + b"\n" for record in records)
+
 # API Endpoints
 @app.get("/", response_model=dict)
 async def root(request: Request, _: bool = Depends(validate_api_key)):
@@ -543,11 +917,11 @@ async def health_check():
     """Health check endpoint - Fast version for demo (no auth required for monitoring)"""
     device_statuses = {}
     
-    for device_name in config.devices:
-        device_statuses[device_name] = {
+    for device in config.device_list:
+        device_statuses[device.name] = {
             "connected": True,  # Assume connected for demo
-            "ip": config.devices[device_name]["ip"],
-            "port": config.devices[device_name]["port"]
+            "ip": device.ip,
+            "port": device.port
         }
     
     return {
@@ -564,12 +938,13 @@ async def health_check_full():
     device_statuses = {}
     overall_healthy = True
     
-    for device_name in config.devices:
-        is_connected = test_device_connection(device_name)
-        device_statuses[device_name] = {
+    connected = await test_device_connections(config.device_names)
+    
+    for device, is_connected in zip(config.device_list, connected):
+        device_statuses[device.name] = {
             "connected": is_connected,
-            "ip": config.devices[device_name]["ip"],
-            "port": config.devices[device_name]["port"]
+            "ip": device.ip,
+            "port": device.port
         }
         if not is_connected:
             overall_healthy = False
@@ -588,7 +963,16 @@ async def get_place_info(request: Request, _: bool = Depends(validate_api_key)):
     client_ip = request.client.host if request.client else "unknown"
     log_security_event("PLACE_INFO_ACCESS", f"Place info accessed", client_ip)
     
-    return create_secure_response({
+    place_info = response_cache.get("place_info")
+    if place_info is None:
+        place_info = build_place_info()
+        response_cache.set("place_info", place_info)
+    
+    return create_secure_response({**place_info, "timestamp": datetime.now().isoformat()})
+
+def build_place_info() -> Dict[str, Any]:
+    """Place details reported by /place/info, without the per-request timestamp"""
+    return {
         "place_id": config.place_id,
         "place_name": config.place_name,
         "place_location": config.place_location,
@@ -608,9 +992,8 @@ async def get_place_info(request: Request, _: bool = Depends(validate_api_key)):
         "api_endpoints": [
             "/", "/health", "/place/info", "/devices", "/attendance", "/users", "/attendance/summary"
         ],
-        "version": "3.0.0",
-        "timestamp": datetime.now().isoformat()
-    })
+        "version": "3.0.0"
+    }
 
 @app.post("/auth/token", response_model=dict)
 async def generate_access_token(request: Request):
@@ -621,10 +1004,10 @@ async def generate_access_token(request: Request):
         if not auth_header.startswith("Bearer "):
             raise HTTPException(status_code=401, detail="Missing authorization header")
         
-        provided_key = auth_header.replace("Bearer ", "")
-        expected_key = os.getenv("UNIFIED_GATEWAY_API_KEY", "")
+        provided_key = auth_header[len("Bearer "):].encode()
+        expected_key = config.unified_gateway_api_key.encode()
         
-        if not expected_key or provided_key != expected_key:
+        if not expected_key or not hmac.compare_digest(provided_key, expected_key):
             client_ip = request.client.host if request.client else "unknown"
             log_security_event("INVALID_TOKEN_REQUEST", f"Invalid unified gateway key from {client_ip}", client_ip)
             raise HTTPException(status_code=401, detail="Invalid gateway authentication")
@@ -648,7 +1031,7 @@ async def generate_access_token(request: Request):
             "token_type": "bearer",
             "expires_in": 3600,
             "place_id": config.place_id,
-            "backend_api_key": os.getenv("BACKEND_API_KEY", ""),
+            "backend_api_key": config.backend_api_key,
             "issued_at": datetime.now().isoformat()
         })
         
@@ -661,38 +1044,42 @@ async def generate_access_token(request: Request):
 @app.get("/devices", response_model=DeviceListResponse)
 async def get_all_devices(request: Request, _: bool = Depends(validate_api_key)):
     """Get list of all configured devices with their status"""
+    device_names = config.device_names
+    cache_key = ("devices", device_names)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     device_list = []
+    connected = await test_device_connections(device_names)
     
-    for device_name, device_config in config.devices.items():
-        is_connected = test_device_connection(device_name)
-        device_info = DeviceInfo(
-            device_name=device_name,
-            device_ip=device_config["ip"],
-            device_port=device_config["port"],
-            backend_name=config.backend_name,
-            is_connected=is_connected,
-            last_sync=datetime.now().isoformat() if is_connected else None
-        )
-        device_list.append(device_info)
+    for device_name, is_connected in zip(device_names, connected):
+        device_list.append(build_device_info(device_name, is_connected))
     
-    return DeviceListResponse(
+    response = DeviceListResponse(
         success=True,
         devices=device_list,
         backend_name=config.backend_name,
         total_devices=len(device_list),
         message=f"Retrieved {len(device_list)} configured devices"
     )
+    response_cache.set(cache_key, response)
+    return response
 
 # Holiday management endpoints
 @app.get("/holidays", response_model=HolidayResponse)
 async def get_holidays():
     """Get current configured holidays"""
     try:
-        return HolidayResponse(
-            success=True,
-            holidays=config.holidays,
-            message=f"Retrieved {len(config.holidays)} configured holidays"
-        )
+        response = response_cache.get("holidays")
+        if response is None:
+            response = HolidayResponse(
+                success=True,
+                holidays=config.holidays,
+                message=f"Retrieved {len(config.holidays)} configured holidays"
+            )
+            response_cache.set("holidays", response)
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -704,11 +1091,10 @@ async def validate_custom_holidays(request: HolidayRequest):
         invalid_dates = []
         
         for date_str in request.dates:
-            try:
-                # Validate date format
-                datetime.strptime(date_str, '%Y-%m-%d')
+            # Validate date format
+            if is_valid_date(date_str):
                 valid_dates.append(date_str)
-            except ValueError:
+            else:
                 invalid_dates.append(date_str)
         
         success = len(invalid_dates) == 0
@@ -730,6 +1116,10 @@ async def get_holiday_suggestions():
     """Get holiday suggestions for current year"""
     try:
         current_year = datetime.now().year
+        cache_key = ("holiday_suggestions", current_year)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         # Predefined holiday suggestions
         suggestions = [
@@ -745,12 +1135,14 @@ async def get_holiday_suggestions():
             {"date": f"{current_year}-12-25", "name": "Christmas Day", "type": "national"},
         ]
         
-        return HolidayResponse(
+        response = HolidayResponse(
             success=True,
             suggestions=suggestions,
             year=current_year,
             message=f"Holiday suggestions for {current_year}"
         )
+        response_cache.set(cache_key, response)
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -760,17 +1152,13 @@ async def get_device_info(device_name: str = Query(..., description="Name of the
     if device_name not in config.devices:
         raise HTTPException(status_code=404, detail=f"Device '{device_name}' not found")
     
-    device_config = config.devices[device_name]
-    is_connected = test_device_connection(device_name)
-    
-    return DeviceInfo(
-        device_name=device_name,
-        device_ip=device_config["ip"],
-        device_port=device_config["port"],
-        backend_name=config.backend_name,
-        is_connected=is_connected,
-        last_sync=datetime.now().isoformat() if is_connected else None
-    )
+    cache_key = ("device_info", device_name)
+    device_info = response_cache.get(cache_key)
+    if device_info is None:
+        is_connected = await asyncio.to_thread(test_device_connection, device_name)
+        device_info = build_device_info(device_name, is_connected)
+        response_cache.set(cache_key, device_info)
+    return device_info
 
 @app.get("/attendance", response_model=AttendanceResponse)
 async def get_attendance_data(
@@ -783,49 +1171,29 @@ async def get_attendance_data(
     _: bool = Depends(validate_api_key)
 ):
     """Get attendance data for specified date range and device"""
+    validate_date_range(start_date, end_date, config.max_date_range_days)
     try:
-        # Validate date format
-        datetime.strptime(start_date, '%Y-%m-%d')
-        datetime.strptime(end_date, '%Y-%m-%d')
-        
         # Parse additional holidays
-        additional_holidays_list = []
-        if additional_holidays:
-            try:
-                additional_holidays_list = [date.strip() for date in additional_holidays.split(',') if date.strip()]
-                # Validate additional holiday dates
-                for holiday_date in additional_holidays_list:
-                    datetime.strptime(holiday_date, '%Y-%m-%d')
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid additional holiday date format. Use YYYY-MM-DD")
+        additional_holidays_set = parse_additional_holidays(additional_holidays)
         
         # Validate device exists
         if device_name not in config.devices:
             raise HTTPException(status_code=404, detail=f"Device '{device_name}' not found")
         
-        records = fetch_attendance_data(start_date, end_date, device_name, additional_holidays_list)
-        
-        # Filter by user if specified
-        if user_name:
-            records = [r for r in records if r.user_name.lower() == user_name.lower()]
+        records = await asyncio.to_thread(fetch_attendance_data, start_date, end_date, device_name, additional_holidays_set, user_name)
         
-        device_config = config.devices[device_name]
-        device_info = DeviceInfo(
-            device_name=device_name,
-            device_ip=device_config["ip"],
-            device_port=device_config["port"],
-            backend_name=config.backend_name,
-            is_connected=True,
-            last_sync=datetime.now().isoformat()
-        )
+        # The fetch just succeeded, so the device is connected
+        cache_key = ("synced_device_info", device_name)
+        device_info = response_cache.get(cache_key)
+        if device_info is None:
+            device_info = build_device_info(device_name, True)
+            response_cache.set(cache_key, device_info)
         
-        return AttendanceResponse(
-            success=True,
-            data=records,
-            device_info=device_info,
-            total_records=len(records),
-            message=f"Successfully retrieved {len(records)} attendance records from {device_name}" +
-                   (f" (with {len(additional_holidays_list)} additional holidays)" if additional_holidays_list else "")
+        return stream_attendance_response(
+            records,
+            device_info,
+            f"Successfully retrieved {len(records)} attendance records from {device_name}" +
+            (f" (with {len(additional_holidays_set)} additional holidays)" if additional_holidays_set else "")
         )
     
     except ValueError as e:
@@ -841,44 +1209,27 @@ async def get_all_attendance_data(
     additional_holidays: Optional[str] = Query(None, description="Comma-separated list of additional holidays in YYYY-MM-DD format")
 ):
     """Get attendance data from all devices for specified date range"""
+    validate_date_range(start_date, end_date, config.max_date_range_days)
     try:
-        # Validate date format
-        datetime.strptime(start_date, '%Y-%m-%d')
-        datetime.strptime(end_date, '%Y-%m-%d')
-        
         # Parse additional holidays
-        additional_holidays_list = []
-        if additional_holidays:
-            try:
-                additional_holidays_list = [date.strip() for date in additional_holidays.split(',') if date.strip()]
-                # Validate additional holiday dates
-                for holiday_date in additional_holidays_list:
-                    datetime.strptime(holiday_date, '%Y-%m-%d')
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid additional holiday date format. Use YYYY-MM-DD")
+        additional_holidays_set = parse_additional_holidays(additional_holidays)
         
         all_records = []
         
-        # Fetch data from all devices
-        for device_name in config.devices:
-            try:
-                records = fetch_attendance_data(start_date, end_date, device_name, additional_holidays_list)
-                all_records.extend(records)
-            except Exception as e:
-                print(f"Error fetching data from {device_name}: {e}")
+        # Fetch data from all devices concurrently
+        device_names = config.device_names
+        results = await fetch_attendance_data_multi(start_date, end_date, device_names, additional_holidays_set, user_name)
+        for device_name, result in zip(device_names, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching data from {device_name}: {result}")
                 continue
+            all_records.extend(result)
         
-        # Filter by user if specified
-        if user_name:
-            all_records = [r for r in all_records if r.user_name.lower() == user_name.lower()]
-        
-        return AttendanceResponse(
-            success=True,
-            data=all_records,
-            device_info=None,
-            total_records=len(all_records),
-            message=f"Successfully retrieved {len(all_records)} attendance records from {len(config.devices)} devices" +
-                   (f" (with {len(additional_holidays_list)} additional holidays)" if additional_holidays_list else "")
+        return stream_attendance_response(
+            all_records,
+            None,
+            f"Successfully retrieved {len(all_records)} attendance records from {len(config.devices)} devices" +
+            (f" (with {len(additional_holidays_set)} additional holidays)" if additional_holidays_set else "")
         )
     
     except ValueError as e:
@@ -886,6 +1237,53 @@ async def get_all_attendance_data(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def fetch_device_users(device_name: str) -> List[Dict[str, Any]]:
+    """Fetch the user list from a specific ZK device over its pooled connection"""
+    shared_key = f"users:{device_name}"
+    if shared_cache:
+        user_list = shared_cache.get(shared_key)
+        if user_list is not None:
+            return user_list
+    
+    with device_connection(device_name) as conn:
+        users = conn.get_users()
+    user_list = [{"user_id": user.user_id, "name": user.name, "privilege": user.privilege} 
+                 for user in users]
+    
+    if shared_cache:
+        shared_cache.set(shared_key, user_list, ttl=config.users_cache_ttl)
+    return user_list
+
+@app.get("/attendance/all.ndjson")
+async def stream_all_attendance_ndjson(
+    start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
+    end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
+    user_name: Optional[str] = Query(None, description="Filter by specific user name"),
+    additional_holidays: Optional[str] = Query(None, description="Comma-separated list of additional holidays in YYYY-MM-DD format")
+):
+    """Stream attendance records from all devices as NDJSON, one device at a time as each finishes"""
+    validate_date_range(start_date, end_date, config.max_date_range_days)
+    
+    additional_holidays_set = parse_additional_holidays(additional_holidays)
+    
+    async def fetch_one(device_name: str):
+        try:
+            return device_name, await fetch_attendance_data_async(start_date, end_date, device_name, additional_holidays_set, user_name)
+        except Exception as e:
+            return device_name, e
+    
+    async def body():
+        for next_result in asyncio.as_completed([fetch_one(name) for name in config.device_names]):
+            device_name, records = await next_result
+            if isinstance(records, Exception):
+                logger.error(f"Error fetching data from {device_name}: {records}")
+                continue
+            chunk = await asyncio.to_thread(encode_ndjson, records)
+            if chunk:
+                yield chunk
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 @app.get("/users", response_model=dict)
 async def get_users(
     request: Request,
@@ -899,20 +1297,8 @@ async def get_users(
     if device_name not in config.devices:
         raise HTTPException(status_code=404, detail=f"Device '{device_name}' not found")
     
-    device_config = config.devices[device_name]
-    
     try:
-        zk = ZK(device_config["ip"], port=device_config["port"], timeout=5, 
-                password=device_config["password"], force_udp=False, ommit_ping=False)
-        conn = zk.connect()
-        conn.disable_device()
-        
-        users = conn.get_users()
-        user_list = [{"user_id": user.user_id, "name": user.name, "privilege": user.privilege} 
-                     for user in users]
-        
-        conn.enable_device()
-        conn.disconnect()
+        user_list = await asyncio.to_thread(fetch_device_users, device_name)
         
         return {
             "success": True,
@@ -933,34 +1319,29 @@ async def get_all_users():
     all_users = {}
     total_users = 0
     
-    for device_name, device_config in config.devices.items():
-        try:
-            zk = ZK(device_config["ip"], port=device_config["port"], timeout=5, 
-                    password=device_config["password"], force_udp=False, ommit_ping=False)
-            conn = zk.connect()
-            conn.disable_device()
-            
-            users = conn.get_users()
-            user_list = [{"user_id": user.user_id, "name": user.name, "privilege": user.privilege} 
-                         for user in users]
-            
-            all_users[device_name] = {
-                "users": user_list,
-                "total_users": len(user_list),
-                "device_ip": device_config["ip"]
-            }
-            total_users += len(user_list)
-            
-            conn.enable_device()
-            conn.disconnect()
-            
-        except Exception as e:
-            print(f"Error fetching users from {device_name}: {e}")
+    async def fetch_one(device_name: str) -> List[Dict[str, Any]]:
+        async with device_semaphore:
+            return await asyncio.to_thread(fetch_device_users, device_name)
+    
+    device_names = config.device_names
+    results = await asyncio.gather(*(fetch_one(name) for name in device_names), return_exceptions=True)
+    
+    for device_name, result in zip(device_names, results):
+        if isinstance(result, Exception):
+            print(f"Error fetching users from {device_name}: {result}")
             all_users[device_name] = {
-                "error": str(e),
+                "error": str(result),
                 "users": [],
                 "total_users": 0
             }
+            continue
+        
+        all_users[device_name] = {
+            "users": result,
+            "total_users": len(result),
+            "device_ip": config.device_lookup[device_name].ip
+        }
+        total_users += len(result)
     
     return {
         "success": True,
@@ -978,63 +1359,54 @@ async def get_attendance_summary(
     additional_holidays: Optional[str] = Query(None, description="Comma-separated list of additional holidays in YYYY-MM-DD format")
 ):
     """Get attendance summary statistics for a specific device"""
+    validate_date_range(start_date, end_date, config.max_date_range_days)
     try:
         if device_name not in config.devices:
             raise HTTPException(status_code=404, detail=f"Device '{device_name}' not found")
         
         # Parse additional holidays
-        additional_holidays_list = []
-        if additional_holidays:
-            try:
-                additional_holidays_list = [date.strip() for date in additional_holidays.split(',') if date.strip()]
-                # Validate additional holiday dates
-                for holiday_date in additional_holidays_list:
-                    datetime.strptime(holiday_date, '%Y-%m-%d')
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid additional holiday date format. Use YYYY-MM-DD")
-        
-        records = fetch_attendance_data(start_date, end_date, device_name, additional_holidays_list)
+        additional_holidays_set = parse_additional_holidays(additional_holidays)
         
-        # Separate holidays from working day records
-        working_records = [r for r in records if r.status != 'Holiday']
-        holiday_records = [r for r in records if r.status == 'Holiday']
+        records = await asyncio.to_thread(fetch_attendance_data, start_date, end_date, device_name, additional_holidays_set)
         
-        total_records = len(records)
-        working_days_count = len(working_records)
-        holiday_count = len(holiday_records)
-        present_count = sum(1 for r in working_records if r.status == 'Present')
-        absent_count = sum(1 for r in working_records if r.status == 'Absent')
-        incomplete_count = sum(1 for r in working_records if r.status == 'Incomplete')
+        if not records:
+            return {
+                "success": True,
+                "device_name": device_name,
+                "date_range": {"start_date": start_date, "end_date": end_date},
+                "overall_stats": dict(EMPTY_OVERALL_STATS),
+                "user_stats": {}
+            }
         
         # Group by user with enhanced statistics (excluding holidays from user stats)
-        user_stats = defaultdict(lambda: {
-            'present_days': 0, 
-            'absent_days': 0, 
-            'incomplete_days': 0, 
-            'holiday_days': 0,
-            'total_working_hours': 0.0,
-            'total_expected_hours': 0.0,
-            'average_working_hours': 0.0,
-            'working_hours_progress': 0.0
-        })
+        user_stats = defaultdict(UserStats)
         
+        # Overall counters and per-user stats are accumulated in a single pass over the records
+        holiday_count = present_count = absent_count = incomplete_count = 0
+        total_actual_hours = 0.0
         for record in records:
-            if record.status == 'Holiday':
-                user_stats[record.user_name]['holiday_days'] += 1
-            else:
-                user_stats[record.user_name][record.status.lower() + '_days'] += 1
-                user_stats[record.user_name]['total_working_hours'] += record.working_hours
-                user_stats[record.user_name]['total_expected_hours'] += record.expected_hours
+            stats = user_stats[record.user_name]
+            status = record.status
+            if status == 'Holiday':
+                holiday_count += 1
+                stats.holiday_days += 1
+                continue
+            
+            if status == 'Present':
+                present_count += 1
+                stats.present_days += 1
+            elif status == 'Absent':
+                absent_count += 1
+                stats.absent_days += 1
+            elif status == 'Incomplete':
+                incomplete_count += 1
+                stats.incomplete_days += 1
+            total_actual_hours += record.working_hours
+            stats.total_working_hours += record.working_hours
+            stats.total_expected_hours += record.expected_hours
         
-        # Calculate averages and progress for each user
-        for user_name, stats in user_stats.items():
-            working_days = stats['present_days'] + stats['absent_days'] + stats['incomplete_days']
-            if working_days > 0:
-                stats['average_working_hours'] = stats['total_working_hours'] / working_days
-                stats['working_hours_progress'] = (stats['total_working_hours'] / stats['total_expected_hours'] * 100) if stats['total_expected_hours'] > 0 else 0.0
-                stats['attendance_rate'] = f"{(stats['present_days'] / working_days * 100):.1f}%"
-            else:
-                stats['attendance_rate'] = "0%"
+        total_records = len(records)
+        working_days_count = total_records - holiday_count
         
         return {
             "success": True,
@@ -1047,13 +1419,13 @@ async def get_attendance_summary(
                 "present_count": present_count,
                 "absent_count": absent_count,
                 "incomplete_count": incomplete_count,
-                "day_based_attendance_rate": f"{(present_count / working_days_count * 100):.1f}%" if working_days_count > 0 else "0%",
+                "day_based_attendance_rate": format_percentage(present_count, working_days_count),
                 "standard_working_hours": 8.0,
                 "total_expected_hours": working_days_count * 8.0,
-                "total_actual_hours": sum(r.working_hours for r in working_records),
-                "hours_based_progress": f"{(sum(r.working_hours for r in working_records) / (working_days_count * 8.0) * 100):.1f}%" if working_days_count > 0 else "0%"
+                "total_actual_hours": total_actual_hours,
+                "hours_based_progress": format_percentage(total_actual_hours, working_days_count * 8.0)
             },
-            "user_stats": dict(user_stats)
+            "user_stats": {user_name: stats.to_dict() for user_name, stats in user_stats.items()}
         }
     
     except Exception as e:
@@ -1066,17 +1438,10 @@ async def get_all_attendance_summary(
     additional_holidays: Optional[str] = Query(None, description="Comma-separated list of additional holidays in YYYY-MM-DD format")
 ):
     """Get attendance summary statistics for all devices"""
+    validate_date_range(start_date, end_date, config.max_date_range_days)
     try:
         # Parse additional holidays
-        additional_holidays_list = []
-        if additional_holidays:
-            try:
-                additional_holidays_list = [date.strip() for date in additional_holidays.split(',') if date.strip()]
-                # Validate additional holiday dates
-                for holiday_date in additional_holidays_list:
-                    datetime.strptime(holiday_date, '%Y-%m-%d')
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid additional holiday date format. Use YYYY-MM-DD")
+        additional_holidays_set = parse_additional_holidays(additional_holidays)
         
         all_stats = {}
         overall_totals = {
@@ -1088,47 +1453,54 @@ async def get_all_attendance_summary(
             "incomplete_count": 0
         }
         
-        for device_name in config.devices:
+        device_names = config.device_names
+        results = await fetch_attendance_data_multi(start_date, end_date, device_names, additional_holidays_set)
+        
+        for device_name, records in zip(device_names, results):
             try:
-                records = fetch_attendance_data(start_date, end_date, device_name, additional_holidays_list)
-                
-                # Separate holidays from working day records
-                working_records = [r for r in records if r.status != 'Holiday']
-                holiday_records = [r for r in records if r.status == 'Holiday']
+                if isinstance(records, Exception):
+                    raise records
                 
-                total_records = len(records)
-                working_days_count = len(working_records)
-                holiday_count = len(holiday_records)
-                present_count = sum(1 for r in working_records if r.status == 'Present')
-                absent_count = sum(1 for r in working_records if r.status == 'Absent')
-                incomplete_count = sum(1 for r in working_records if r.status == 'Incomplete')
-                
-                # Update overall totals
-                overall_totals["total_records"] += total_records
-                overall_totals["working_days_count"] += working_days_count
-                overall_totals["holiday_count"] += holiday_count
-                overall_totals["present_count"] += present_count
-                overall_totals["absent_count"] += absent_count
-                overall_totals["incomplete_count"] += incomplete_count
+                if not records:
+                    all_stats[device_name] = {"device_stats": dict(EMPTY_DEVICE_STATS), "user_stats": {}}
+                    continue
                 
-                # Group by user for this device (excluding holidays from user stats)
+                # Count statuses per user for this device in a single pass (holidays kept separate)
                 user_stats = defaultdict(lambda: {'present': 0, 'absent': 0, 'incomplete': 0, 'holiday': 0})
+                holiday_count = present_count = absent_count = incomplete_count = 0
                 for record in records:
-                    if record.status == 'Holiday':
+                    status = record.status
+                    if status == 'Holiday':
+                        holiday_count += 1
                         user_stats[record.user_name]['holiday'] += 1
-                    else:
-                        user_stats[record.user_name][record.status.lower()] += 1
+                        continue
+                    
+                    if status == 'Present':
+                        present_count += 1
+                    elif status == 'Absent':
+                        absent_count += 1
+                    elif status == 'Incomplete':
+                        incomplete_count += 1
+                    user_stats[record.user_name][STATUS_KEYS[status]] += 1
+                
+                total_records = len(records)
+                working_days_count = total_records - holiday_count
+                device_stats = {
+                    "total_records": total_records,
+                    "working_days_count": working_days_count,
+                    "holiday_count": holiday_count,
+                    "present_count": present_count,
+                    "absent_count": absent_count,
+                    "incomplete_count": incomplete_count
+                }
+                
+                # Update overall totals from the same counters
+                for key in overall_totals:
+                    overall_totals[key] += device_stats[key]
                 
+                device_stats["attendance_rate"] = format_percentage(present_count, working_days_count)
                 all_stats[device_name] = {
-                    "device_stats": {
-                        "total_records": total_records,
-                        "working_days_count": working_days_count,
-                        "holiday_count": holiday_count,
-                        "present_count": present_count,
-                        "absent_count": absent_count,
-                        "incomplete_count": incomplete_count,
-                        "attendance_rate": f"{(present_count / working_days_count * 100):.1f}%" if working_days_count > 0 else "0%"
-                    },
+                    "device_stats": device_stats,
                     "user_stats": dict(user_stats)
                 }
                 
@@ -1142,7 +1514,7 @@ async def get_all_attendance_summary(
             "date_range": {"start_date": start_date, "end_date": end_date},
             "overall_stats": {
                 **overall_totals,
-                "attendance_rate": f"{(overall_totals['present_count'] / overall_totals['working_days_count'] * 100):.1f}%" if overall_totals['working_days_count'] > 0 else "0%"
+                "attendance_rate": format_percentage(overall_totals['present_count'], overall_totals['working_days_count'])
             },
             "devices": all_stats
         }
@@ -1157,13 +1529,12 @@ if __name__ == "__main__":
     print(f"Total Devices: {len(config.devices)}")
     print(f"Calendar Library: {'python-calendrical' if CALENDRICAL_AVAILABLE else 'standard fallback'}")
     
-    # Test connection for all devices on startup
+    # Test connection for all devices on startup, concurrently so a dead device costs one timeout in total
     print("\nTesting device connections:")
-    for device_name, device_config in config.devices.items():
-        print(f"  - {device_name} ({device_config['ip']}:{device_config['port']})", end=" ")
-        if test_device_connection(device_name):
-            print("✅ Connected")
-        else:
-            print("❌ Failed")
+    with ThreadPoolExecutor(max_workers=max(len(config.device_list), 1)) as executor:
+        results = executor.map(test_device_connection, config.device_names)
+        for device, connected in zip(config.device_list, results):
+            status = "✅ Connected" if connected else "❌ Failed"
+            print(f"  - {device.name} ({device.ip}:{device.port}) {status}")
     
     uvicorn.run(app, host="0.0.0.0", port=config.backend_port)
\ No newline at end of file
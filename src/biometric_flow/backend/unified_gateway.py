@@ -5,13 +5,20 @@ Enhanced with comprehensive security features and multi-place support
 """
 from fastapi import FastAPI, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable
 from datetime import datetime
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
 import asyncio
 import aiohttp
+import orjson
 import json
 import os
+import ssl
+import time
 import uvicorn
 from pathlib import Path
 import logging
@@ -28,15 +35,43 @@ from security import (
     log_security_event, create_secure_response, create_error_response,
     generate_secure_session, create_jwt_token, verify_jwt_token
 )
+from cache import TTLCache, create_shared_cache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def create_backend_ssl_context() -> ssl.SSLContext:
+    """Build the TLS context shared by every backend connection so TLS sessions can be resumed"""
+    ctx = ssl.create_default_context()
+    ctx.set_alpn_protocols(["http/1.1"])
+    if os.getenv("BACKEND_VERIFY_SSL", "true").lower() != "true":
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one keep-alive HTTP session with every place backend over the app lifetime"""
+    app.state.http = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=15),
+        connector=aiohttp.TCPConnector(
+            limit=100, limit_per_host=20, keepalive_timeout=75, enable_cleanup_closed=True,
+            ttl_dns_cache=300,
+            ssl=create_backend_ssl_context()
+        )
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.close()
+
 app = FastAPI(
     title="🔒 Secure Unified Fingerprint Attendance Backend Gateway",
     description="Enhanced secure unified API gateway that aggregates data from all place backends with powerful security",
     version="3.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if os.getenv("ENVIRONMENT") != "production" else None,
     redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None,
     openapi_url="/openapi.json" if os.getenv("ENVIRONMENT") != "production" else None
@@ -59,9 +94,47 @@ class UnifiedConfig:
     def __init__(self):
         # Load backend configurations
         self.backends = self._load_backend_configs()
+        
+        # Static views of the backend config; backends only change on restart
+        self.backend_names = tuple(self.backends)
+        self.root_places_info = [
+            {
+                "name": backend_name,
+                "location": backend_config.get('location', 'Unknown'),
+                "url": backend_config['url'],
+                "devices": backend_config.get('devices', [])
+            }
+            for backend_name, backend_config in self.backends.items()
+        ]
+        self.places_info = [
+            {**place, "description": self.backends[place["name"]].get('description', '')}
+            for place in self.root_places_info
+        ]
+        self.backends_info = [
+            {**place, "timeout": self.backends[place["name"]].get('timeout', 30)}
+            for place in self.places_info
+        ]
+        self.holidays = [
+            holiday
+            for backend_config in self.backends.values()
+            for holiday in backend_config.get('holidays', [])
+        ]
+        
         self.gateway_port = int(os.getenv("GATEWAY_PORT", "9000"))
         self.frontend_backend_port = int(os.getenv("FRONTEND_BACKEND_PORT", "9001"))
         
+        # Response caching for the aggregated endpoints (REDIS_URL shares it between workers)
+        self.redis_url = os.getenv("REDIS_URL", "")
+        self.list_cache_ttl = float(os.getenv("LIST_CACHE_TTL", "30"))
+        self.attendance_cache_ttl = float(os.getenv("ATTENDANCE_CACHE_TTL", "5"))
+        self.stale_cache_ttl = float(os.getenv("STALE_CACHE_TTL", "3600"))
+        # Merged attendance responses larger than this are built off the event loop
+        self.merge_offload_records = int(os.getenv("MERGE_OFFLOAD_RECORDS", "10000"))
+        
+        # Opt-in: per-backend timeouts shrink to a multiple of recent latency, never below half the configured one
+        self.adaptive_timeouts = os.getenv("ADAPTIVE_BACKEND_TIMEOUTS", "false").lower() == "true"
+        self.min_backend_timeout = float(os.getenv("MIN_BACKEND_TIMEOUT", "2"))
+        
     def _load_backend_configs(self) -> Dict[str, Dict[str, Any]]:
         """Load backend configurations from environment or config file"""
         # Try to load from config file first
@@ -107,6 +180,11 @@ class UnifiedConfig:
 
 config = UnifiedConfig()
 
+# Fresh aggregated responses, plus the last good copy of each served when every backend fails
+response_cache = TTLCache(maxsize=128, ttl=config.list_cache_ttl)
+stale_cache = TTLCache(maxsize=128, ttl=config.stale_cache_ttl)
+shared_cache = create_shared_cache(config.redis_url, prefix="biometricflow:gateway", ttl=config.list_cache_ttl)
+
 # Response Models
 class UnifiedDeviceInfo(BaseModel):
     device_name: str
@@ -151,24 +229,19 @@ class PlaceSummary(BaseModel):
     is_healthy: bool
 
 # Helper Functions
-async def call_backend(session: aiohttp.ClientSession, backend_name: str, endpoint: str, params: Dict = None) -> Dict:
-    """Enhanced secure backend communication with improved authentication"""
-    if backend_name not in config.backends:
-        log_security_event("BACKEND_NOT_FOUND", f"Backend '{backend_name}' not found", "gateway")
-        raise HTTPException(status_code=404, detail=f"Backend '{backend_name}' not found")
-    
-    backend_config = config.backends[backend_name]
-    url = f"{backend_config['url']}{endpoint}"
-    
-    # Enhanced authentication headers
-    headers = {
-        "User-Agent": "BiometricFlow-Gateway/3.0",
-        "X-Gateway-Request": "true",
-        "Content-Type": "application/json"
-    }
+GATEWAY_HEADERS = {
+    "User-Agent": "BiometricFlow-Gateway/3.0",
+    "X-Gateway-Request": "true",
+    "Content-Type": "application/json"
+}
+
+@lru_cache(maxsize=64)
+def backend_headers(backend_name: str) -> Dict[str, str]:
+    """Static request headers for a backend, including its API key; callers must copy before changing"""
+    headers = dict(GATEWAY_HEADERS)
     
     # Multiple authentication methods - use place-specific API key
-    place_api_key = backend_config.get('api_key')
+    place_api_key = config.backends[backend_name].get('api_key')
     backend_api_key = os.getenv("PLACE_BACKEND_API_KEY")  # Use PLACE_BACKEND_API_KEY instead
     main_api_key = os.getenv("MAIN_API_KEY")
     
@@ -180,20 +253,74 @@ async def call_backend(session: aiohttp.ClientSession, backend_name: str, endpoi
         headers["Authorization"] = f"Bearer {main_api_key}"
     else:
         logger.warning(f"No API key configured for backend communication with {backend_name}")
+    return headers
+
+# Endpoints that may pull logs from a ZK device; their latency depends on the request, so they keep the configured timeout
+DEVICE_DATA_ENDPOINT_PREFIXES = ("/attendance", "/users", "/device")
+
+@dataclass(slots=True)
+class BackendMetrics:
+    """Call counters and smoothed latency of one backend, reported by /metrics"""
+    requests: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    latency_ewma: Dict[str, float] = field(default_factory=dict)  # seconds, per endpoint path
+    
+    def timeout_for(self, endpoint: str, configured: float) -> float:
+        """Three times the recent latency of this endpoint, kept between half the configured timeout and the configured one"""
+        if not config.adaptive_timeouts or endpoint.startswith(DEVICE_DATA_ENDPOINT_PREFIXES):
+            return configured
+        ewma = self.latency_ewma.get(endpoint)
+        if ewma is None:
+            return configured
+        floor = max(config.min_backend_timeout, configured / 2)
+        return min(configured, max(floor, 3 * ewma))
+    
+    def record_latency(self, endpoint: str, elapsed: float) -> None:
+        """Fold a response time into the endpoint's exponentially weighted moving average"""
+        ewma = self.latency_ewma.get(endpoint)
+        self.latency_ewma[endpoint] = elapsed if ewma is None else 0.8 * ewma + 0.2 * elapsed
+
+backend_metrics = {backend_name: BackendMetrics() for backend_name in config.backend_names}
+
+@lru_cache(maxsize=256)
+def backend_url(backend_name: str, endpoint: str) -> str:
+    """Full URL of an endpoint on a backend, joined once per (backend, endpoint) pair"""
+    return f"{config.backends[backend_name]['url']}{endpoint}"
+
+@lru_cache(maxsize=64)
+def gateway_token(backend_name: str, minute_bucket: int) -> str:
+    """Signed gateway JWT for a backend, reused for the rest of the current minute"""
+    return create_jwt_token({"gateway": True, "backend": backend_name})
+
+async def call_backend(session: aiohttp.ClientSession, backend_name: str, endpoint: str, params: Dict = None) -> Dict:
+    """Enhanced secure backend communication with improved authentication"""
+    backend_config = config.backends.get(backend_name)
+    if backend_config is None:
+        log_security_event("BACKEND_NOT_FOUND", f"Backend '{backend_name}' not found", "gateway")
+        raise HTTPException(status_code=404, detail=f"Backend '{backend_name}' not found")
+    
+    url = backend_url(backend_name, endpoint)
+    
+    # Enhanced authentication headers
+    headers = backend_headers(backend_name).copy()
     
     # Add JWT token for enhanced security if available
     try:
-        jwt_payload = {"gateway": True, "backend": backend_name}
-        jwt_token = create_jwt_token(jwt_payload)
-        headers["X-Gateway-Token"] = jwt_token
+        headers["X-Gateway-Token"] = gateway_token(backend_name, int(time.time() // 60))
     except Exception as e:
         logger.debug(f"JWT token creation failed: {e}")
     
+    metrics = backend_metrics[backend_name]
+    metrics.requests += 1
+    timeout_seconds = metrics.timeout_for(endpoint, backend_config.get('timeout', 15))  # Reduced timeout for NGROK
+    started = time.perf_counter()
     try:
-        timeout = aiohttp.ClientTimeout(total=backend_config.get('timeout', 15))  # Reduced timeout for NGROK
-        async with session.get(url, params=params, headers=headers, timeout=timeout, ssl=False) as response:
+        timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+        async with session.get(url, params=params, headers=headers, timeout=timeout) as response:
             if response.status == 200:
-                data = await response.json()
+                data = orjson.loads(await response.read())
+                metrics.record_latency(endpoint, time.perf_counter() - started)
                 # Add backend metadata to response
                 if isinstance(data, dict):
                     data['_backend_name'] = backend_name
@@ -201,7 +328,9 @@ async def call_backend(session: aiohttp.ClientSession, backend_name: str, endpoi
                     data['_place_location'] = backend_config.get('location', 'Unknown')
                     data['_response_time'] = response.headers.get('X-Process-Time', 'unknown')
                 return data
-            elif response.status == 401:
+            
+            metrics.errors += 1
+            if response.status == 401:
                 log_security_event("BACKEND_AUTH_FAILED", f"Authentication failed for backend {backend_name}", "gateway")
                 return {
                     "success": False,
@@ -241,6 +370,9 @@ async def call_backend(session: aiohttp.ClientSession, backend_name: str, endpoi
                     "_place_location": backend_config.get('location', 'Unknown')
                 }
     except asyncio.TimeoutError:
+        # Count the timeout as a slow response so a backend that has slowed down earns a longer timeout
+        metrics.timeouts += 1
+        metrics.record_latency(endpoint, timeout_seconds)
         log_security_event("BACKEND_TIMEOUT", f"Timeout calling backend {backend_name}", "gateway")
         return {
             "success": False,
@@ -251,6 +383,7 @@ async def call_backend(session: aiohttp.ClientSession, backend_name: str, endpoi
             "_place_location": backend_config.get('location', 'Unknown')
         }
     except Exception as e:
+        metrics.errors += 1
         log_security_event("BACKEND_ERROR", f"Error calling backend {backend_name}: {str(e)}", "gateway")
         return {
             "success": False,
@@ -261,28 +394,72 @@ async def call_backend(session: aiohttp.ClientSession, backend_name: str, endpoi
             "_place_location": backend_config.get('location', 'Unknown')
         }
 
+# Fan-outs currently running, keyed by endpoint and params, so identical concurrent calls share one
+_inflight_fanouts: Dict[tuple, asyncio.Task] = {}
+
 async def call_all_backends(endpoint: str, params: Dict = None) -> List[Dict]:
-    """Call an endpoint on all backends simultaneously"""
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for backend_name in config.backends:
-            task = call_backend(session, backend_name, endpoint, params)
-            tasks.append(task)
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Filter out exceptions and failed calls
-        valid_results = []
-        for result in results:
-            if isinstance(result, dict) and not isinstance(result, Exception):
-                valid_results.append(result)
-        
-        return valid_results
+    """Call an endpoint on all backends simultaneously.
+
+    Concurrent calls with the same endpoint and params wait on a single fan-out and receive
+    the same result list, so callers must not mutate it.
+    """
+    key = (endpoint, tuple(sorted(params.items())) if params else ())
+    task = _inflight_fanouts.get(key)
+    if task is None:
+        task = asyncio.create_task(fan_out_to_backends(endpoint, params))
+        _inflight_fanouts[key] = task
+        task.add_done_callback(lambda _: _inflight_fanouts.pop(key, None))
+    # Shield so one caller disconnecting does not cancel the fan-out for the others
+    return await asyncio.shield(task)
+
+async def fan_out_to_backends(endpoint: str, params: Dict = None) -> List[Dict]:
+    """Send one request to every backend concurrently and keep the dict results"""
+    session = app.state.http
+    tasks = []
+    for backend_name in config.backend_names:
+        task = call_backend(session, backend_name, endpoint, params)
+        tasks.append(task)
+    
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # Filter out exceptions (call_backend reports failed calls as dicts)
+    return [result for result in results if isinstance(result, dict)]
 
 async def call_specific_place_backend(backend_name: str, endpoint: str, params: Dict = None) -> Dict:
     """Call a specific place backend"""
-    async with aiohttp.ClientSession() as session:
-        return await call_backend(session, backend_name, endpoint, params)
+    return await call_backend(app.state.http, backend_name, endpoint, params)
+
+async def cached_response(key: str, ttl: float, build: Callable[[], Awaitable[Dict]]) -> Dict:
+    """Serve an aggregated response from cache, building and caching it on a miss.
+
+    A response is only cached when at least one backend answered. If none did, the last
+    good response for the same key is returned instead, when there is one.
+    """
+    response = response_cache.get(key)
+    if response is not None:
+        return response
+    if shared_cache:
+        response = await asyncio.to_thread(shared_cache.get, key)
+        if response is not None:
+            response_cache.set(key, response, ttl=ttl)
+            return response
+    
+    response = await build()
+    if response.get("backend_sources"):
+        response_cache.set(key, response, ttl=ttl)
+        stale_cache.set(key, response)
+        if shared_cache:
+            await asyncio.to_thread(shared_cache.set, key, response, ttl)
+            await asyncio.to_thread(shared_cache.set, f"stale:{key}", response, config.stale_cache_ttl)
+        return response
+    
+    stale = stale_cache.get(key)
+    if stale is None and shared_cache:
+        stale = await asyncio.to_thread(shared_cache.get, f"stale:{key}")
+    if stale is not None:
+        logger.warning(f"No backend answered for {key}; serving last cached response")
+        return stale
+    return response
 
 # Unified API Endpoints
 
@@ -292,20 +469,11 @@ async def root(request: Request, _: bool = Depends(validate_api_key)):
     client_ip = request.client.host if request.client else "unknown"
     log_security_event("API_ACCESS", "Root endpoint accessed", client_ip)
     
-    places_info = []
-    for backend_name, backend_config in config.backends.items():
-        places_info.append({
-            "name": backend_name,
-            "location": backend_config.get('location', 'Unknown'),
-            "url": backend_config['url'],
-            "devices": backend_config.get('devices', [])
-        })
-    
     return create_secure_response({
         "service": "🔒 Secure Unified Fingerprint Attendance Gateway",
         "version": "3.0.0",
         "total_places": len(config.backends),
-        "places": places_info,
+        "places": config.root_places_info,
         "gateway_port": config.gateway_port,
         "frontend_backend_port": config.frontend_backend_port,
         "status": "running",
@@ -352,7 +520,7 @@ async def generate_frontend_token(request: Request):
         token_payload = {
             "service": "frontend",
             "permissions": ["read_all_places", "read_devices", "read_attendance", "read_users", "read_summary"],
-            "places": list(config.backends.keys()),
+            "places": list(config.backend_names),
             "expires_in": int(os.getenv("FRONTEND_JWT_EXPIRE_HOURS", "8")) * 3600
         }
         
@@ -366,7 +534,7 @@ async def generate_frontend_token(request: Request):
             "token_type": "bearer",
             "expires_in": int(os.getenv("FRONTEND_JWT_EXPIRE_HOURS", "8")) * 3600,
             "permissions": token_payload["permissions"],
-            "available_places": list(config.backends.keys()),
+            "available_places": list(config.backend_names),
             "issued_at": datetime.now().isoformat()
         })
         
@@ -386,32 +554,31 @@ async def get_place_backend_token(place_name: str, request: Request, _: bool = D
         backend_config = config.backends[place_name]
         
         # Request token from place backend
-        async with aiohttp.ClientSession() as session:
-            url = f"{backend_config['url']}/auth/token"
-            headers = {
-                "Authorization": f"Bearer {os.getenv('UNIFIED_GATEWAY_API_KEY', '')}",
-                "Content-Type": "application/json"
-            }
-            
-            async with session.post(url, headers=headers) as response:
-                if response.status == 200:
-                    token_data = await response.json()
-                    
-                    client_ip = request.client.host if request.client else "unknown"
-                    log_security_event("PLACE_TOKEN_OBTAINED", f"Token obtained from place {place_name}", client_ip)
-                    
-                    return create_secure_response({
-                        "place_name": place_name,
-                        "access_token": token_data.get("data", {}).get("access_token"),
-                        "backend_api_key": token_data.get("data", {}).get("backend_api_key"),
-                        "expires_in": token_data.get("data", {}).get("expires_in", 3600),
-                        "place_id": token_data.get("data", {}).get("place_id"),
-                        "obtained_at": datetime.now().isoformat()
-                    })
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Failed to get token from place {place_name}: {response.status} - {error_text}")
-                    raise HTTPException(status_code=502, detail=f"Failed to get token from place backend")
+        url = f"{backend_config['url']}/auth/token"
+        headers = {
+            "Authorization": f"Bearer {os.getenv('UNIFIED_GATEWAY_API_KEY', '')}",
+            "Content-Type": "application/json"
+        }
+        
+        async with app.state.http.post(url, headers=headers) as response:
+            if response.status == 200:
+                token_data = orjson.loads(await response.read())
+                
+                client_ip = request.client.host if request.client else "unknown"
+                log_security_event("PLACE_TOKEN_OBTAINED", f"Token obtained from place {place_name}", client_ip)
+                
+                return create_secure_response({
+                    "place_name": place_name,
+                    "access_token": token_data.get("data", {}).get("access_token"),
+                    "backend_api_key": token_data.get("data", {}).get("backend_api_key"),
+                    "expires_in": token_data.get("data", {}).get("expires_in", 3600),
+                    "place_id": token_data.get("data", {}).get("place_id"),
+                    "obtained_at": datetime.now().isoformat()
+                })
+            else:
+                error_text = await response.text()
+                logger.error(f"Failed to get token from place {place_name}: {response.status} - {error_text}")
+                raise HTTPException(status_code=502, detail=f"Failed to get token from place backend")
                     
     except HTTPException:
         raise
@@ -424,28 +591,28 @@ async def health_check():
     """Health check for the unified gateway"""
     backend_health = {}
     
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for backend_name in config.backends:
-            task = call_backend(session, backend_name, "/health")
-            tasks.append((backend_name, task))
-        
-        for backend_name, task in tasks:
-            try:
-                result = await task
-                backend_health[backend_name] = {
-                    "status": "healthy" if result.get("status", False) == "healthy" else "unhealthy",
-                    "location": config.backends[backend_name].get('location', 'Unknown'),
-                    "url": config.backends[backend_name]['url'],
-                    "response": result
-                }
-            except Exception as e:
-                backend_health[backend_name] = {
-                    "status": "unhealthy",
-                    "location": config.backends[backend_name].get('location', 'Unknown'),
-                    "url": config.backends[backend_name]['url'],
-                    "error": str(e)
-                }
+    session = app.state.http
+    backend_names = config.backend_names
+    results = await asyncio.gather(
+        *(call_backend(session, backend_name, "/health") for backend_name in backend_names),
+        return_exceptions=True
+    )
+    
+    for backend_name, result in zip(backend_names, results):
+        if isinstance(result, Exception):
+            backend_health[backend_name] = {
+                "status": "unhealthy",
+                "location": config.backends[backend_name].get('location', 'Unknown'),
+                "url": config.backends[backend_name]['url'],
+                "error": str(result)
+            }
+        else:
+            backend_health[backend_name] = {
+                "status": "healthy" if result.get("status", False) == "healthy" else "unhealthy",
+                "location": config.backends[backend_name].get('location', 'Unknown'),
+                "url": config.backends[backend_name]['url'],
+                "response": result
+            }
     
     healthy_backends = sum(1 for h in backend_health.values() if h["status"] == "healthy")
     
@@ -457,12 +624,29 @@ async def health_check():
         "place_health": backend_health
     }
 
+@app.get("/metrics", response_model=dict)
+async def get_backend_metrics():
+    """Per-backend request, timeout and error counts with smoothed latency and current timeouts"""
+    backends = {}
+    for backend_name, metrics in backend_metrics.items():
+        configured = config.backends[backend_name].get('timeout', 15)
+        backends[backend_name] = {
+            "requests": metrics.requests,
+            "timeouts": metrics.timeouts,
+            "errors": metrics.errors,
+            "latency_ewma_ms": {endpoint: round(ewma * 1000, 1) for endpoint, ewma in metrics.latency_ewma.items()},
+            "timeouts_s": {endpoint: round(metrics.timeout_for(endpoint, configured), 2) for endpoint in metrics.latency_ewma}
+        }
+    return {
+        "success": True,
+        "adaptive_timeouts": config.adaptive_timeouts,
+        "backends": backends
+    }
+
 @app.get("/holidays", response_model=dict)
 async def get_holidays():
     """Get all holidays information"""
-    holidays = []
-    for backend_name, backend_config in config.backends.items():
-        holidays.extend(backend_config.get('holidays', []))
+    holidays = config.holidays
     return {
         "success": True,
         "holidays": holidays,
@@ -473,20 +657,17 @@ async def get_holidays():
 @app.get("/holidays/{year}", response_model=dict)
 async def get_holidays_by_year(year: int):
     """Get holidays for a specific year"""
-    holidays = []
-    for backend_name, backend_config in config.backends.items():
-        holidays.extend(backend_config.get('holidays', []))
-    
     # Filter holidays by year if they have date information
     filtered_holidays = []
-    for holiday in holidays:
+    for holiday in config.holidays:
         if isinstance(holiday, dict) and 'date' in holiday:
-            try:
-                holiday_date = datetime.strptime(holiday['date'], '%Y-%m-%d')
-                if holiday_date.year == year:
-                    filtered_holidays.append(holiday)
-            except:
-                # If date parsing fails, include the holiday anyway
+            # Dates are YYYY-MM-DD, so the year is just the first four characters
+            holiday_date = holiday['date']
+            holiday_year = holiday_date[:4] if isinstance(holiday_date, str) and len(holiday_date) == 10 else ''
+            if not holiday_year.isdigit():
+                # If the date is malformed, include the holiday anyway
+                filtered_holidays.append(holiday)
+            elif int(holiday_year) == year:
                 filtered_holidays.append(holiday)
         else:
             # If no date info, include all holidays
@@ -503,16 +684,7 @@ async def get_holidays_by_year(year: int):
 @app.get("/places", response_model=dict)
 async def get_places():
     """Get all places information"""
-    places = []
-    for backend_name, backend_config in config.backends.items():
-        places.append({
-            "name": backend_name,
-            "location": backend_config.get('location', 'Unknown'),
-            "url": backend_config['url'],
-            "devices": backend_config.get('devices', []),
-            "description": backend_config.get('description', '')
-        })
-    
+    places = config.places_info
     return {
         "success": True,
         "places": places,
@@ -523,6 +695,10 @@ async def get_places():
 @app.get("/devices/all", response_model=dict)
 async def get_all_devices_unified():
     """Get all devices from all places unified"""
+    return await cached_response("devices:all", config.list_cache_ttl, build_all_devices)
+
+async def build_all_devices() -> Dict[str, Any]:
+    """Fan out to every place for its devices and merge them"""
     results = await call_all_backends("/devices")
     
     all_devices = []
@@ -537,11 +713,11 @@ async def get_all_devices_unified():
             if place_location not in places:
                 places.append(place_location)
             
-            for device in result["devices"]:
-                # Enhance device info with place information
-                device["backend_name"] = backend_name
-                device["place_location"] = place_location
-                all_devices.append(device)
+            # Enhance device info with place information
+            all_devices.extend(
+                {**device, "backend_name": backend_name, "place_location": place_location}
+                for device in result["devices"]
+            )
     
     return {
         "success": True,
@@ -557,7 +733,8 @@ async def get_all_attendance_unified(
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
     user_name: Optional[str] = Query(None, description="Filter by specific user name"),
-    additional_holidays: Optional[str] = Query(None, description="Comma-separated list of additional holidays")
+    additional_holidays: Optional[str] = Query(None, description="Comma-separated list of additional holidays"),
+    stream: bool = Query(False, description="Stream records as NDJSON as each place answers")
 ):
     """Get attendance data from all places unified"""
     params = {
@@ -569,9 +746,25 @@ async def get_all_attendance_unified(
     if additional_holidays:
         params["additional_holidays"] = additional_holidays
     
+    if stream:
+        return StreamingResponse(stream_all_attendance(params), media_type="application/x-ndjson")
+    
+    cache_key = f"attendance:all:{start_date}:{end_date}:{user_name or ''}:{additional_holidays or ''}"
+    return await cached_response(cache_key, config.attendance_cache_ttl, lambda: build_all_attendance(params))
+
+def merge_tagged_records(tagged_results: List[tuple]) -> List[Dict[str, Any]]:
+    """Flatten (records, backend_name, place_location) groups into one list of tagged records"""
+    return [
+        {**record, "backend_name": backend_name, "place_location": place_location}
+        for records, backend_name, place_location in tagged_results
+        for record in records
+    ]
+
+async def build_all_attendance(params: Dict[str, str]) -> Dict[str, Any]:
+    """Fan out to every place for attendance records and merge them"""
     results = await call_all_backends("/attendance/all", params)
     
-    all_records = []
+    tagged_results = []
     backend_sources = []
     places = []
     
@@ -582,12 +775,14 @@ async def get_all_attendance_unified(
             backend_sources.append(backend_name)
             if place_location not in places:
                 places.append(place_location)
-            
-            for record in result["data"]:
-                # Enhance record with place information
-                record["backend_name"] = backend_name
-                record["place_location"] = place_location
-                all_records.append(record)
+            tagged_results.append((result["data"], backend_name, place_location))
+    
+    # Enhance records with place information; large merges run in a worker thread so
+    # the event loop keeps serving other requests meanwhile
+    if sum(len(records) for records, _, _ in tagged_results) > config.merge_offload_records:
+        all_records = await asyncio.to_thread(merge_tagged_records, tagged_results)
+    else:
+        all_records = merge_tagged_records(tagged_results)
     
     return {
         "success": True,
@@ -598,15 +793,43 @@ async def get_all_attendance_unified(
         "message": f"Retrieved {len(all_records)} records from {len(backend_sources)} places"
     }
 
+async def stream_all_attendance(params: Dict[str, str]):
+    """Yield NDJSON attendance records from every place, one place at a time as each answers"""
+    session = app.state.http
+    tasks = [
+        asyncio.create_task(call_backend(session, backend_name, "/attendance/all", params))
+        for backend_name in config.backend_names
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if not (result.get("success") and "data" in result):
+                continue
+            backend_name = result.get("_backend_name", "Unknown")
+            place_location = result.get("_place_location", "Unknown")
+            chunk = b"".join(
+                orjson.dumps({**record, "backend_name": backend_name, "place_location": place_location}) + b"\n"
+                for record in result["data"]
+            )
+            if chunk:
+                yield chunk
+    finally:
+        # The client may disconnect mid-stream; stop any fetches still running
+        for task in tasks:
+            task.cancel()
+
 @app.get("/users/all", response_model=dict)
 async def get_all_users_unified():
     """Get all users from all places unified"""
+    return await cached_response("users:all", config.list_cache_ttl, build_all_users)
+
+async def build_all_users() -> Dict[str, Any]:
+    """Fan out to every place for its users and merge them, dropping duplicates"""
     results = await call_all_backends("/users/all")
     
-    all_users = []
+    merged_users: Dict[tuple, Dict[str, Any]] = {}  # First occurrence of each (name, userid) wins
     backend_sources = []
     places = []
-    user_set = set()  # To avoid duplicates
     
     for result in results:
         if result.get("success") and "users" in result:
@@ -617,14 +840,12 @@ async def get_all_users_unified():
                 places.append(place_location)
             
             for user in result["users"]:
-                # Create unique user identifier
-                user_key = f"{user.get('name', '')}-{user.get('userid', '')}"
-                if user_key not in user_set:
-                    user_set.add(user_key)
+                user_key = (user.get('name', ''), user.get('userid', ''))
+                if user_key not in merged_users:
                     # Enhance user info with place information
-                    user["backend_name"] = backend_name
-                    user["place_location"] = place_location
-                    all_users.append(user)
+                    merged_users[user_key] = {**user, "backend_name": backend_name, "place_location": place_location}
+    
+    all_users = list(merged_users.values())
     
     return {
         "success": True,
@@ -684,11 +905,13 @@ async def get_place_devices(place_name: str):
     """Get devices from a specific place"""
     result = await call_specific_place_backend(place_name, "/devices")
     
-    if result.get("success"):
+    if result.get("success") and "devices" in result:
         # Enhance devices with place information
-        for device in result.get("devices", []):
-            device["backend_name"] = place_name
-            device["place_location"] = config.backends[place_name].get('location', 'Unknown')
+        place_location = config.backends[place_name].get('location', 'Unknown')
+        result["devices"] = [
+            {**device, "backend_name": place_name, "place_location": place_location}
+            for device in result["devices"]
+        ]
     
     return result
 
@@ -718,9 +941,10 @@ async def get_place_attendance(
     if result.get("success") and "data" in result:
         # Enhance records with place information
         place_location = config.backends[place_name].get('location', 'Unknown')
-        for record in result["data"]:
-            record["backend_name"] = place_name
-            record["place_location"] = place_location
+        result["data"] = [
+            {**record, "backend_name": place_name, "place_location": place_location}
+            for record in result["data"]
+        ]
     
     return result
 
@@ -732,9 +956,10 @@ async def get_place_users(place_name: str):
     if result.get("success") and "users" in result:
         # Enhance users with place information
         place_location = config.backends[place_name].get('location', 'Unknown')
-        for user in result["users"]:
-            user["backend_name"] = place_name
-            user["place_location"] = place_location
+        result["users"] = [
+            {**user, "backend_name": place_name, "place_location": place_location}
+            for user in result["users"]
+        ]
     
     return result
 
@@ -765,15 +990,24 @@ async def get_place_summary(
 # Device-specific endpoints (across all places)
 @app.get("/device/{device_name}/info", response_model=dict)
 async def get_device_info(device_name: str):
-    """Get device information from any place"""
-    results = await call_all_backends(f"/device/info?device_name={device_name}")
-    
-    for result in results:
-        if result.get("success") and result.get("device_name") == device_name:
-            # Enhance with place information
-            result["backend_name"] = result.get("_backend_name", "Unknown")
-            result["place_location"] = result.get("_place_location", "Unknown")
-            return result
+    """Get device information from any place, answering as soon as one place has the device"""
+    session = app.state.http
+    tasks = [
+        asyncio.create_task(call_backend(session, backend_name, "/device/info", {"device_name": device_name}))
+        for backend_name in config.backend_names
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if result.get("device_name") == device_name:
+                # Enhance with place information
+                result["backend_name"] = result.get("_backend_name", "Unknown")
+                result["place_location"] = result.get("_place_location", "Unknown")
+                return result
+    finally:
+        # Stop waiting on places that have not answered yet
+        for task in tasks:
+            task.cancel()
     
     raise HTTPException(status_code=404, detail=f"Device '{device_name}' not found in any place")
 
@@ -800,16 +1034,14 @@ async def get_device_attendance(
     
     for result in results:
         if result.get("success") and "data" in result:
-            # Check if this result has data for our device
-            device_data = [record for record in result["data"] if record.get("device_name") == device_name]
+            # Pick this result's records for our device, enhanced with place information
+            place_location = result.get("_place_location", "Unknown")
+            backend_name = result.get("_backend_name", "Unknown")
+            device_data = [
+                {**record, "backend_name": backend_name, "place_location": place_location}
+                for record in result["data"] if record.get("device_name") == device_name
+            ]
             if device_data:
-                # Enhance with place information
-                place_location = result.get("_place_location", "Unknown")
-                backend_name = result.get("_backend_name", "Unknown")
-                for record in device_data:
-                    record["backend_name"] = backend_name
-                    record["place_location"] = place_location
-                
                 return {
                     "success": True,
                     "data": device_data,
@@ -826,17 +1058,7 @@ async def get_device_attendance(
 @app.get("/backends/list", response_model=dict)
 async def list_backends():
     """List all available backends/places"""
-    backends_info = []
-    for backend_name, backend_config in config.backends.items():
-        backends_info.append({
-            "name": backend_name,
-            "location": backend_config.get('location', 'Unknown'),
-            "url": backend_config['url'],
-            "devices": backend_config.get('devices', []),
-            "description": backend_config.get('description', ''),
-            "timeout": backend_config.get('timeout', 30)
-        })
-    
+    backends_info = config.backends_info
     return {
         "success": True,
         "backends": backends_info,
@@ -859,4 +1081,14 @@ if __name__ == "__main__":
         if devices:
             print(f"    Devices: {', '.join(devices)}")
     
-    uvicorn.run(app, host="0.0.0.0", port=config.gateway_port)
+    # uvicorn picks up uvloop and httptools automatically when installed. Extra workers need
+    # REDIS_URL to share response caches; rate limits are tracked per worker.
+    workers = int(os.getenv("GATEWAY_WORKERS", "1"))
+    if workers > 1:
+        print(f"Workers: {workers}")
+        uvicorn.run(
+            "unified_gateway:app", host="0.0.0.0", port=config.gateway_port, workers=workers,
+            app_dir=os.path.dirname(os.path.abspath(__file__))
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=config.gateway_port)
@@ -0,0 +1,116 @@
+"""
+Caching helpers for BiometricFlow-ZK
+Small thread-safe in-process TTL cache, plus an optional Redis-backed cache shared across workers
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire ``ttl`` seconds after being set.
+
+    When ``maxsize`` is reached the oldest entry is evicted.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache value under key for ttl seconds (defaults to the cache TTL)"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (expires_at, value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value, expired or not"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        """Drop every cached entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class RedisCache:
+    """JSON value cache in Redis, shared by every worker and replica pointing at the same server.
+
+    Keys are strings namespaced under ``prefix``. Redis errors are logged and treated as
+    cache misses so an unavailable Redis never fails a request.
+    """
+
+    def __init__(self, url: str, prefix: str = "biometricflow", ttl: float = 60.0):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is not installed")
+        self.prefix = prefix
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the decoded value for key, or default on a miss or Redis error"""
+        try:
+            raw = self._client.get(self._key(key))
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache get failed for {key}: {e}")
+            return default
+        return default if raw is None else orjson.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serialisable value under key for ttl seconds (defaults to the cache TTL)"""
+        expire_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        try:
+            self._client.set(self._key(key), orjson.dumps(value), px=expire_ms)
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache set failed for {key}: {e}")
+
+
+def create_shared_cache(url: Optional[str], prefix: str = "biometricflow", ttl: float = 60.0) -> Optional[RedisCache]:
+    """Build a RedisCache when a URL is configured and redis is installed, otherwise None"""
+    if not url:
+        return None
+    if not REDIS_AVAILABLE:
+        logger.warning("REDIS_URL is set but the redis package is not installed; shared cache disabled")
+        return None
+    return RedisCache(url, prefix=prefix, ttl=ttl)
+
+
+__all__ = ['TTLCache', 'RedisCache', 'create_shared_cache', 'REDIS_AVAILABLE']
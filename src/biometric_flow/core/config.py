@@ -4,8 +4,10 @@ Configuration Management
 Handles loading and managing configuration from various sources.
 """
 
+import copy
 import json
 import os
+from functools import cached_property, lru_cache
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from decouple import config
@@ -13,6 +15,28 @@ from decouple import config
 from .models import Device, PlaceConfig, DeviceStatus
 
 
+# Parsed files are memoized by path and modification time, so an edited file is re-read
+# on its next use while unchanged files never touch the disk again beyond a stat()
+@lru_cache(maxsize=32)
+def _load_json(path: str, mtime_ns: int) -> Any:
+    """Parse a JSON file; the result is shared, so public accessors hand out deep copies"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=32)
+def _load_env_file(path: str, mtime_ns: int) -> Dict[str, str]:
+    """Parse KEY=VALUE lines of an env file, skipping blanks and comments"""
+    env_vars = {}
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                key, value = line.split('=', 1)
+                env_vars[key] = value.strip('"\'')
+    return env_vars
+
+
 class ConfigManager:
     """Configuration manager for the BiometricFlow system"""
     
@@ -33,8 +57,7 @@ class ConfigManager:
         if not config_file.exists():
             raise FileNotFoundError(f"Device config not found: {config_file}")
         
-        with open(config_file, 'r') as f:
-            config_data = json.load(f)
+        config_data = _load_json(str(config_file), config_file.stat().st_mtime_ns)
         
         devices = []
         for device_data in config_data.get("devices", []):
@@ -51,8 +74,7 @@ class ConfigManager:
     
     def load_place_config(self, place_name: str) -> PlaceConfig:
         """Load complete place configuration including devices"""
-        backends_config = self.load_backends_config()
-        place_info = backends_config.get("places", {}).get(place_name)
+        place_info = self._shared_backends_config().get("places", {}).get(place_name)
         
         if not place_info:
             raise ValueError(f"Place not found in configuration: {place_name}")
@@ -70,6 +92,10 @@ class ConfigManager:
     
     def load_backends_config(self) -> Dict[str, Any]:
         """Load unified backends configuration"""
+        return copy.deepcopy(self._shared_backends_config())
+    
+    def _shared_backends_config(self) -> Dict[str, Any]:
+        """Memoized backends configuration for read-only use inside this class"""
         config_file = self.environments_dir / "backends.json"
         
         if not config_file.exists():
@@ -79,13 +105,16 @@ class ConfigManager:
         if not config_file.exists():
             raise FileNotFoundError(f"Backends config not found: {config_file}")
         
-        with open(config_file, 'r') as f:
-            return json.load(f)
+        return _load_json(str(config_file), config_file.stat().st_mtime_ns)
+    
+    @property
+    def backends_config(self) -> Dict[str, Any]:
+        """Unified backends configuration, re-parsed only when the file changes"""
+        return self.load_backends_config()
     
     def get_all_places(self) -> List[str]:
         """Get list of all configured places"""
-        backends_config = self.load_backends_config()
-        return list(backends_config.get("places", {}).keys())
+        return list(self._shared_backends_config().get("places", {}).keys())
     
     def get_environment_config(self, env: str = "development") -> Dict[str, str]:
         """Load environment-specific configuration"""
@@ -95,28 +124,37 @@ class ConfigManager:
             # Fallback to .env in config root
             env_file = self.config_root / ".env"
         
-        env_vars = {}
-        if env_file.exists():
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        key, value = line.split('=', 1)
-                        env_vars[key] = value.strip('"\'')
+        if not env_file.exists():
+            return {}
         
-        return env_vars
+        return dict(_load_env_file(str(env_file), env_file.stat().st_mtime_ns))
+    
+    @cached_property
+    def database_url(self) -> str:
+        """Database URL, resolved from the environment once per manager"""
+        return config('DATABASE_URL', default='sqlite:///biometric_flow.db')
+    
+    @cached_property
+    def redis_url(self) -> str:
+        """Redis URL, resolved from the environment once per manager"""
+        return config('REDIS_URL', default='redis://localhost:6379')
+    
+    @cached_property
+    def log_level(self) -> str:
+        """Log level, resolved from the environment once per manager"""
+        return config('LOG_LEVEL', default='INFO')
     
     def get_database_url(self) -> str:
         """Get database URL from configuration"""
-        return config('DATABASE_URL', default='sqlite:///biometric_flow.db')
+        return self.database_url
     
     def get_redis_url(self) -> str:
         """Get Redis URL from configuration"""
-        return config('REDIS_URL', default='redis://localhost:6379')
+        return self.redis_url
     
     def get_log_level(self) -> str:
         """Get log level from configuration"""
-        return config('LOG_LEVEL', default='INFO')
+        return self.log_level
 
 
 # Global configuration instance
@@ -26,7 +26,7 @@ class AttendanceType(Enum):
     BREAK_END = "break_end"
 
 
-@dataclass
+@dataclass(slots=True)
 class Device:
     """Fingerprint device model"""
     name: str
@@ -45,7 +45,7 @@ class Device:
         return f"{self.ip}:{self.port}"
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     """User model"""
     user_id: int
@@ -57,7 +57,7 @@ class User:
     card: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class AttendanceRecord:
     """Attendance record model"""
     user_id: int
@@ -73,7 +73,7 @@ class AttendanceRecord:
         return self.timestamp.strftime("%Y-%m-%d %H:%M:%S")
 
 
-@dataclass
+@dataclass(slots=True)
 class PlaceConfig:
     """Place configuration model"""
     name: str
@@ -87,7 +87,7 @@ class PlaceConfig:
         self.devices.append(device)
 
 
-@dataclass
+@dataclass(slots=True)
 class SystemHealth:
     """System health status model"""
     unified_gateway_status: bool
@@ -105,7 +105,7 @@ class SystemHealth:
         return (self.healthy_devices / self.total_devices) * 100
 
 
-@dataclass
+@dataclass(slots=True)
 class ApiResponse:
     """Standard API response model"""
     success: bool
@@ -4,6 +4,8 @@ Provides powerful but simple security features for NGROK and production deployme
 """
 
 import os
+import base64
+import json
 import secrets
 import hashlib
 import hmac
@@ -11,24 +13,43 @@ import time
 import jwt
 import re
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Set, Union
+from typing import Optional, Dict, List, Set, FrozenSet, Union, Tuple
 from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import logging
 import ipaddress
 
+try:
+    from .cache import TTLCache
+except ImportError:  # Loaded as a top-level module from the core directory
+    from cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
 # Security Configuration
 class SecurityConfig:
     def __init__(self):
         # API Key Authentication
         self.api_keys = self._load_api_keys()
         
+        # Development-only bypass for requests without credentials
+        self.allow_no_auth = (
+            os.getenv("ENVIRONMENT") == "development"
+            and os.getenv("ALLOW_NO_AUTH", "false").lower() == "true"
+        )
+        
         # JWT Configuration
         self.jwt_secret = os.getenv("JWT_SECRET", secrets.token_urlsafe(32))
         self.jwt_algorithm = "HS256"
         self.jwt_expire_hours = int(os.getenv("JWT_EXPIRE_HOURS", "24"))
+        # HMAC keyed once; copying it per token skips re-hashing the key blocks
+        self.jwt_hmac = hmac.new(self.jwt_secret.encode("utf-8"), digestmod=hashlib.sha256)
         
         # Rate limiting configuration (enhanced for NGROK)
         self.rate_limit_requests = int(os.getenv("RATE_LIMIT_REQUESTS", "60"))  # Reduced for NGROK
@@ -64,9 +85,16 @@ class SecurityConfig:
             r'drop\s+table',    # SQL injection
             r'exec\(',          # Code execution
         ]
+        # All patterns as one case-insensitive alternation, so a body is scanned in a single search.
+        # RE2 guarantees linear time on large bodies where re could backtrack on ".*" patterns.
+        combined_pattern = "(?i)" + "|".join(f"(?:{pattern})" for pattern in self.blocked_patterns)
+        self.blocked_pattern = (re2 if RE2_AVAILABLE else re).compile(combined_pattern)
     
-        # IP Allowlist for enhanced security
+        # IP Allowlist for enhanced security, parsed once into addresses and networks
         self.allowed_ips = self._get_allowed_ips()
+        self.allowed_ip_strings = frozenset(self.allowed_ips)
+        self.allowed_addresses, self.allowed_networks = self._parse_allowed_ips()
+        self.allowed_network_table = self._build_network_table()
         
         
     def _load_api_keys(self) -> Set[str]:
@@ -89,8 +117,8 @@ class SecurityConfig:
                 logger.warning("Set MAIN_API_KEY environment variable for production")
             api_keys.add(main_key)
             
-            # Backend communication key
-            backend_key = os.getenv("BACKEND_API_KEY")
+            # Backend communication key - defaults to the main key when not set separately
+            backend_key = os.getenv("BACKEND_API_KEY") or os.getenv("MAIN_API_KEY")
             if not backend_key:
                 backend_key = secrets.token_urlsafe(32)
                 logger.warning(f"Generated BACKEND API key: {backend_key}")
@@ -169,32 +197,102 @@ class SecurityConfig:
             allowed_ips.extend(ngrok_ranges)
         
         return allowed_ips
+    
+    def _parse_allowed_ips(self) -> Tuple[Set[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]], List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]]:
+        """Split the allowlist into single addresses and CIDR networks, skipping entries that are neither"""
+        addresses = set()
+        networks = []
+        for allowed in self.allowed_ips:
+            try:
+                if "/" in allowed:  # CIDR notation
+                    networks.append(ipaddress.ip_network(allowed, strict=False))
+                else:  # Single IP
+                    addresses.add(ipaddress.ip_address(allowed))
+            except ValueError:
+                continue  # e.g. "localhost", matched by string only
+        return addresses, networks
+    
+    def _build_network_table(self) -> Dict[int, List[Tuple[int, FrozenSet[int]]]]:
+        """Group allowed networks by IP version and prefix length as (netmask, network addresses).
+
+        An address matches when masking it with one of its version's netmasks gives a network
+        in that set, so a lookup costs one probe per distinct prefix length, not per network.
+        """
+        by_prefix: Dict[Tuple[int, int], Set[int]] = {}
+        netmasks: Dict[Tuple[int, int], int] = {}
+        for network in self.allowed_networks:
+            key = (network.version, network.prefixlen)
+            by_prefix.setdefault(key, set()).add(int(network.network_address))
+            netmasks[key] = int(network.netmask)
+        
+        table: Dict[int, List[Tuple[int, FrozenSet[int]]]] = {4: [], 6: []}
+        for (version, prefixlen), network_addresses in sorted(by_prefix.items()):
+            table[version].append((netmasks[(version, prefixlen)], frozenset(network_addresses)))
+        return table
 
 # Global security configuration
 security_config = SecurityConfig()
 
-# Rate limiting storage (in-memory for simplicity)
-rate_limit_storage: Dict[str, List[float]] = {}
+# Rate limiting storage (in-memory for simplicity): token bucket per IP as (tokens, last refill time)
+rate_limit_storage: Dict[str, Tuple[float, float]] = {}
 
 # Blocked requests cache
 blocked_ips_cache: Dict[str, float] = {}
 
+# Security log file, opened lazily in append mode and kept open until it is rotated away
+SECURITY_LOG_FILE = "logs/security.log"
+_security_log_fd: Optional[int] = None
+
+# Decoded JWT payloads keyed by a digest of the token (never the token itself), kept until
+# they expire so a client reusing its bearer token skips decode and signature checks.
+# validate_api_key runs in the threadpool, hence the thread-safe cache.
+JWT_CACHE_MAX_ENTRIES = 4096
+_jwt_cache = TTLCache(maxsize=JWT_CACHE_MAX_ENTRIES)
+
+# Binary body content types the middleware neither buffers nor scans for blocked patterns;
+# every other body (including any +json/+xml type and a missing content type) is scanned
+UNSCANNED_CONTENT_TYPES = ("image/", "audio/", "video/", "application/octet-stream")
+
 # Security bearer scheme
 security_bearer = HTTPBearer(auto_error=False)
 
+# Base64url of the fixed HS256 JWT header
+JWT_HEADER_SEGMENT = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded base64url encoding used by JWT segments"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
 def create_jwt_token(payload: Dict) -> str:
-    """Create JWT token for secure communication"""
+    """Create JWT token for secure communication.
+
+    HS256 is signed directly with a copy of the pre-keyed HMAC; the result is a standard JWT
+    that verify_jwt_token (PyJWT) decodes as before. Other algorithms go through jwt.encode.
+    """
+    issued_at = int(time.time())
     payload.update({
-        "exp": datetime.utcnow() + timedelta(hours=security_config.jwt_expire_hours),
-        "iat": datetime.utcnow(),
+        "exp": issued_at + security_config.jwt_expire_hours * 3600,
+        "iat": issued_at,
         "iss": "BiometricFlow-ZK"
     })
-    return jwt.encode(payload, security_config.jwt_secret, algorithm=security_config.jwt_algorithm)
+    if security_config.jwt_algorithm != "HS256":
+        return jwt.encode(payload, security_config.jwt_secret, algorithm=security_config.jwt_algorithm)
+    signing_input = JWT_HEADER_SEGMENT + b"." + _b64url(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signature = security_config.jwt_hmac.copy()
+    signature.update(signing_input)
+    return (signing_input + b"." + _b64url(signature.digest())).decode("ascii")
 
 def verify_jwt_token(token: str) -> Optional[Dict]:
     """Verify JWT token"""
+    cache_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    payload = _jwt_cache.get(cache_key)
+    if payload is not None:
+        return dict(payload)  # Callers get their own copy of the cached payload
+    
     try:
         payload = jwt.decode(token, security_config.jwt_secret, algorithms=[security_config.jwt_algorithm])
+        if isinstance(payload.get("exp"), (int, float)):
+            _jwt_cache.set(cache_key, dict(payload), ttl=payload["exp"] - time.time())
         return payload
     except jwt.ExpiredSignatureError:
         logger.warning("JWT token expired")
@@ -205,11 +303,7 @@ def verify_jwt_token(token: str) -> Optional[Dict]:
 
 def is_safe_request(request_data: str) -> bool:
     """Check if request contains malicious patterns"""
-    request_lower = request_data.lower()
-    for pattern in security_config.blocked_patterns:
-        if re.search(pattern, request_lower, re.IGNORECASE):
-            return False
-    return True
+    return security_config.blocked_pattern.search(request_data) is None
 
 def is_ip_allowed(client_ip: str) -> bool:
     """Check if IP is in allowlist"""
@@ -217,45 +311,44 @@ def is_ip_allowed(client_ip: str) -> bool:
         return True  # No restrictions if no IPs specified
     
     # Check exact matches
-    if client_ip in security_config.allowed_ips:
+    if client_ip in security_config.allowed_ip_strings:
         return True
     
-    # Check IP ranges
+    # Check parsed addresses, then IP ranges
     try:
         client_addr = ipaddress.ip_address(client_ip)
-        for allowed in security_config.allowed_ips:
-            try:
-                if "/" in allowed:  # CIDR notation
-                    network = ipaddress.ip_network(allowed, strict=False)
-                    if client_addr in network:
-                        return True
-                else:  # Single IP
-                    if client_addr == ipaddress.ip_address(allowed):
-                        return True
-            except ValueError:
-                continue
     except ValueError:
         # Invalid IP format
         return False
     
-    return False
+    if client_addr in security_config.allowed_addresses:
+        return True
+    client_int = int(client_addr)
+    return any(
+        client_int & netmask in network_addresses
+        for netmask, network_addresses in security_config.allowed_network_table[client_addr.version]
+    )
+
+# Proxy headers carrying the original client IP (priority order), as lowercase
+# byte strings the way they appear in the raw ASGI scope
+CLIENT_IP_HEADERS = (
+    b"x-forwarded-for",
+    b"x-real-ip",
+    b"x-original-forwarded-for",
+    b"cf-connecting-ip",  # Cloudflare
+    b"true-client-ip"     # Akamai
+)
 
 def get_client_ip(request: Request) -> str:
     """Get client IP address, considering NGROK and proxy headers"""
-    # Check for NGROK forwarded IP (priority order)
-    headers_to_check = [
-        "X-Forwarded-For",
-        "X-Real-IP", 
-        "X-Original-Forwarded-For",
-        "CF-Connecting-IP",  # Cloudflare
-        "True-Client-IP"     # Akamai
-    ]
-    
-    for header in headers_to_check:
-        value = request.headers.get(header)
+    # One pass over the raw headers; reversed so the first occurrence of a repeated header wins
+    raw_headers = dict(reversed(request.scope["headers"]))
+    
+    for header in CLIENT_IP_HEADERS:
+        value = raw_headers.get(header)
         if value:
             # Handle comma-separated IPs (take first one)
-            ip = value.split(",")[0].strip()
+            ip = value.decode("latin-1").split(",")[0].strip()
             if ip and ip != "unknown":
                 return ip
     
@@ -265,7 +358,6 @@ def get_client_ip(request: Request) -> str:
 def check_rate_limit(client_ip: str) -> bool:
     """Enhanced rate limiting with IP blocking"""
     current_time = time.time()
-    window_start = current_time - security_config.rate_limit_window
     
     # Check if IP is temporarily blocked
     if client_ip in blocked_ips_cache:
@@ -274,31 +366,27 @@ def check_rate_limit(client_ip: str) -> bool:
         else:
             del blocked_ips_cache[client_ip]
     
-    # Clean old entries
-    if client_ip in rate_limit_storage:
-        rate_limit_storage[client_ip] = [
-            timestamp for timestamp in rate_limit_storage[client_ip]
-            if timestamp > window_start
-        ]
-    else:
-        rate_limit_storage[client_ip] = []
+    # Refill the bucket at rate_limit_requests tokens per window, capped at a full bucket
+    limit = security_config.rate_limit_requests
+    tokens, last_refill = rate_limit_storage.get(client_ip, (limit, current_time))
+    tokens = min(limit, tokens + (current_time - last_refill) * limit / security_config.rate_limit_window)
     
     # Check if rate limit exceeded
-    if len(rate_limit_storage[client_ip]) >= security_config.rate_limit_requests:
+    if tokens < 1:
         # Block IP for 5 minutes on rate limit exceeded
         blocked_ips_cache[client_ip] = current_time + 300
         log_security_event("RATE_LIMIT_EXCEEDED", f"IP blocked for 5 minutes", client_ip)
         return False
     
-    # Add current request
-    rate_limit_storage[client_ip].append(current_time)
+    # Spend a token on the current request
+    rate_limit_storage[client_ip] = (tokens - 1, current_time)
     return True
 
 def validate_api_key(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_bearer)) -> bool:
     """Enhanced API key validation with JWT support"""
     if not credentials:
         # Check if development mode allows requests without API key
-        if os.getenv("ENVIRONMENT") == "development" and os.getenv("ALLOW_NO_AUTH", "false").lower() == "true":
+        if security_config.allow_no_auth:
             logger.warning("Request without API key - allowed in development mode")
             return True
         
@@ -310,13 +398,13 @@ def validate_api_key(credentials: Optional[HTTPAuthorizationCredentials] = Depen
     
     token = credentials.credentials
     
-    # Try JWT validation first
-    jwt_payload = verify_jwt_token(token)
-    if jwt_payload:
+    # Static API keys are a set lookup, so check them before paying for a JWT decode
+    if token in security_config.api_keys:
         return True
     
-    # Fallback to API key validation
-    if token in security_config.api_keys:
+    # Fallback to JWT validation
+    jwt_payload = verify_jwt_token(token)
+    if jwt_payload:
         return True
     
     # Invalid credentials
@@ -329,7 +417,7 @@ def validate_api_key(credentials: Optional[HTTPAuthorizationCredentials] = Depen
 
 async def security_middleware(request: Request, call_next):
     """Enhanced security middleware for NGROK deployment"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Get client IP
     client_ip = get_client_ip(request)
@@ -365,8 +453,9 @@ async def security_middleware(request: Request, call_next):
             detail="Request payload too large"
         )
     
-    # Content validation for POST/PUT requests
-    if request.method in ["POST", "PUT", "PATCH"]:
+    # Content validation for POST/PUT requests, except known binary bodies
+    content_type = request.headers.get("content-type", "").lower().lstrip()
+    if request.method in ["POST", "PUT", "PATCH"] and not content_type.startswith(UNSCANNED_CONTENT_TYPES):
         try:
             body = await request.body()
             if body and not is_safe_request(body.decode('utf-8', errors='ignore')):
@@ -390,7 +479,7 @@ async def security_middleware(request: Request, call_next):
         response.headers["X-NGROK-Secured"] = "true"
     
     # Add processing time header
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     response.headers["X-Process-Time"] = str(round(process_time, 3))
     
     # Log request (minimal logging for performance)
@@ -424,21 +513,37 @@ def log_security_event(event_type: str, details: str, client_ip: str = "unknown"
     
     # Write to security log file
     try:
-        log_file = "logs/security.log"
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(f"{timestamp} - {event_type} - {client_ip} - {details}\n")
+        log_line = f"{timestamp} - {event_type} - {client_ip} - {details}\n"
+        os.write(_get_security_log_fd(), log_line.encode("utf-8"))
     except Exception as e:
         logger.error(f"Failed to write security log: {e}")
 
+def _get_security_log_fd() -> int:
+    """Security log opened with O_APPEND so each event is a single write, reopened after rotation or deletion"""
+    global _security_log_fd
+    if _security_log_fd is not None:
+        try:
+            current = os.stat(SECURITY_LOG_FILE)
+            opened = os.fstat(_security_log_fd)
+            if (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino):
+                return _security_log_fd
+        except FileNotFoundError:
+            pass
+        os.close(_security_log_fd)
+        _security_log_fd = None
+    os.makedirs(os.path.dirname(SECURITY_LOG_FILE), exist_ok=True)
+    _security_log_fd = os.open(SECURITY_LOG_FILE, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    return _security_log_fd
+
 def create_secure_response(data: any, message: str = "Success") -> Dict:
     """Create a standardized secure response"""
+    now = time.time()  # One clock read for both timestamps
     return {
         "success": True,
         "data": data,
         "message": message,
-        "timestamp": datetime.now().isoformat(),
-        "server_time": int(time.time()),
+        "timestamp": datetime.fromtimestamp(now).isoformat(),
+        "server_time": int(now),
         "security_level": "secure"
     }
 
@@ -8,6 +8,7 @@ import sys
 import time
 import subprocess
 import threading
+import concurrent.futures
 import requests
 from pathlib import Path
 
@@ -189,11 +190,15 @@ class ServiceOrchestrator:
             return False
         
         try:
-            # Start services in order
-            if not self.start_service("Place Backend", "start_place_backend.py", 8000, 15):
-                return False
-            
-            if not self.start_service("Unified Gateway", "start_unified_gateway.py", 9000, 15):
+            # Start backend services concurrently - neither needs the other to boot
+            backend_services = [
+                ("Place Backend", "start_place_backend.py", 8000, 15),
+                ("Unified Gateway", "start_unified_gateway.py", 9000, 15),
+            ]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(backend_services)) as executor:
+                started = list(executor.map(lambda service: self.start_service(*service), backend_services))
+            
+            if not all(started):
                 return False
             
             # Test authentication before starting frontend
@@ -42,7 +42,9 @@ def main():
             str(frontend_file),
             "--server.port=8501",
             "--server.address=0.0.0.0",
-            "--server.headless=true"
+            "--server.headless=true",
+            "--server.fileWatcherType=none",
+            "--server.runOnSave=false"
         ])
     except KeyboardInterrupt:
         print("\n🛑 Frontend shutdown requested")